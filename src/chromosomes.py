@@ -0,0 +1,405 @@
+"""
+Genomes with several chromosomes.
+
+A MultiGenome is a Genome made of a list of chromosomes, each a Genome
+of its own. Positions in the MultiGenome are positions in the
+chromosomes laid out one after the other, and TE ids are handed out by
+the MultiGenome, so every TE has a global id as well as the local id it
+has in its chromosome.
+
+sim_sharded simulates a MultiGenome with the chromosomes spread over
+worker processes. The simulation runs in epochs: at the start of an
+epoch the operations are divided between the chromosomes, and each
+chromosome then does its share independently of the others. Copies that
+land outside their chromosome are collected and done when the epoch is
+over, in a fixed order, so the result only depends on the seed and not
+on how many workers there are or which finishes first.
+"""
+
+from __future__ import annotations
+import bisect
+import itertools
+from array import array
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Iterable, Sequence, Type
+import numpy as np
+from genome import Genome, ArrayGenome, operation
+from samplers import ByFamily, as_sampler
+from simulate import SimParams
+
+
+class MultiGenome(Genome):
+    """
+    Representation of a genome with several chromosomes.
+
+    Implements the Genome interface on top of a list of chromosomes,
+    which can be any other implementation. The genome is still circular:
+    the last position of the last chromosome is followed by the first
+    position of the first, so copies can move TEs from one chromosome to
+    another.
+
+    TE ids are mapped between global and local ids with compact arrays:
+    chromosome[te] and local[te] give the chromosome and local id of a
+    global id, and globals[c][local] the global id of a local one.
+    """
+
+    def __init__(self, sizes: Sequence[int] | int,
+                 genome_class: Type[Genome] = ArrayGenome):
+        """Create a genome with chromosomes of the given sizes."""
+        if isinstance(sizes, int):
+            sizes = [sizes]
+        super().__init__(sum(sizes))
+        self.id = 0  # Last TE ID handed out
+        self.chromosomes = [genome_class(n) for n in sizes]
+        self.chromosome = array('q', [-1])
+        self.local = array('q', [0])
+        self.globals = [array('q', [0]) for _ in sizes]
+
+    def offsets(self) -> list[int]:
+        """Get the position where each chromosome starts."""
+        return list(itertools.accumulate(
+            (len(c) for c in self.chromosomes[:-1]), initial=0
+        ))
+
+    def route(self, pos: int) -> tuple[int, int]:
+        """
+        Get the chromosome and its local position for a global position.
+
+        A position at the border between two chromosomes is the start of
+        the latter, except at the very end, which is the end of the last
+        chromosome.
+
+        >>> genome = MultiGenome([5, 5])
+        >>> genome.route(3), genome.route(5), genome.route(10)
+        ((0, 3), (1, 0), (1, 5))
+        """
+        offsets = self.offsets()
+        c = max(bisect.bisect_right(offsets, pos) - 1, 0)
+        return c, pos - offsets[c]
+
+    def to_local(self, te: int) -> tuple[int, int]:
+        """Get the chromosome and local id of a TE."""
+        return self.chromosome[te], self.local[te]
+
+    def to_global(self, chromosome: int, te: int) -> int:
+        """Get the global id of a TE from its chromosome and local id."""
+        return self.globals[chromosome][te]
+
+    def _register(self, chromosome: int, te: int, parent: int = 0) -> int:
+        """Give a TE new in a chromosome its global id."""
+        assert te == len(self.globals[chromosome]), "local ids out of order"
+        self.id += 1
+        self.globals[chromosome].append(self.id)
+        self.chromosome.append(chromosome)
+        self.local.append(te)
+        self.lineage.record(self.id, parent)
+        return self.id
+
+    def _insert(self, pos: int, length: int, parent: int = 0) -> int:
+        """Insert a TE at a global position, as a copy of parent if given."""
+        c, local = self.route(pos)
+        return self._register(c, self.chromosomes[c].insert_te(local, length),
+                              parent)
+
+    @operation
+    def insert_te(self, pos: int, length: int) -> int:
+        """
+        Insert a new transposable element.
+
+        Insert a new transposable element at position pos and len
+        nucleotide forward, in the chromosome that pos falls in.
+
+        If the TE collides with an existing TE, i.e. genome[pos]
+        already contains TEs, then that TE should be disabled and
+        removed from the set of active TEs.
+
+        Returns a new ID for the transposable element.
+        """
+        if pos < 0:
+            pos = len(self) + pos
+        return self._insert(pos, length)
+
+    @operation
+    def copy_te(self, te: int, offset: int) -> int | None:
+        """
+        Copy a transposable element.
+
+        Copy the transposable element te to an offset from its current
+        location. The copy can end up in another chromosome than te.
+
+        The offset can be positive or negative; if positive the te is copied
+        upwards and if negative it is copied downwards. If the offset moves
+        the copy left of index 0 or right of the largest index, it should
+        wrap around, since the genome is circular.
+
+        If te is not active, return None (and do not copy it).
+        """
+        location = self.locate_te(te)
+        if location is None:
+            return None
+        start, end = location
+        return self._insert((start + offset) % len(self), end - start, te)
+
+    @operation
+    def disable_te(self, te: int) -> None:
+        """
+        Disable a TE.
+
+        If te is an active TE, then make it inactive. Inactive
+        TEs are already inactive, so there is no need to do anything
+        for those.
+        """
+        if 0 < te <= self.id:
+            c, local = self.to_local(te)
+            self.chromosomes[c].disable_te(local)
+
+    def active_tes(self) -> list[int]:
+        """Get the active TE IDs."""
+        return sorted(
+            self.globals[c][te]
+            for c, chromosome in enumerate(self.chromosomes)
+            for te in chromosome.active_tes()
+        )
+
+    def locate_te(self, te: int) -> tuple[int, int] | None:
+        """Get the current coordinates of a TE."""
+        if not 0 < te <= self.id:
+            return None
+        c, local = self.to_local(te)
+        location = self.chromosomes[c].locate_te(local)
+        if location is None:
+            return None
+        offset = self.offsets()[c]
+        return location[0] + offset, location[1] + offset
+
+    def te_segments(self) -> tuple[np.ndarray, np.ndarray,
+                                   np.ndarray, np.ndarray]:
+        """Get the stretches of the genome covered by TEs."""
+        segments = []
+        for c, offset in enumerate(self.offsets()):
+            ids, starts, ends, active = self.chromosomes[c].te_segments()
+            globals_ = np.frombuffer(self.globals[c], dtype=np.int64)
+            segments.append(
+                (globals_[ids], starts + offset, ends + offset, active)
+            )
+        ids, starts, ends, active = zip(*segments)
+        return (np.concatenate(ids), np.concatenate(starts),
+                np.concatenate(ends), np.concatenate(active))
+
+    def nbytes(self) -> int:
+        """Get the approximate number of bytes used by the genome."""
+        return sum(c.nbytes() for c in self.chromosomes) + \
+            3 * 8 * (self.id + 1)
+
+    @classmethod
+    def estimate_nbytes(cls, n: int, length: int, tes: int) -> int:
+        """Estimate the number of bytes a genome would use."""
+        # Chromosomes of the default kind and three int64 per TE to map
+        # between global and local ids
+        return ArrayGenome.estimate_nbytes(n, length, tes) + 3 * 8 * tes
+
+    def __len__(self) -> int:
+        """Current length of the genome."""
+        return sum(len(c) for c in self.chromosomes)
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of the genome.
+
+        The chromosomes are shown one after the other, with no separator,
+        as a single circular genome.
+        """
+        return "".join(str(c) for c in self.chromosomes)
+
+    def merge(self, chromosome: int, genome: Genome) -> None:
+        """
+        Replace a chromosome with a version that has more operations done.
+
+        The TEs that are new in genome get global ids in the order of their
+        local ids, with the parents from its lineage.
+        """
+        parents = genome.lineage.parent
+        self.chromosomes[chromosome] = genome
+        globals_ = self.globals[chromosome]
+        for te in range(len(globals_), len(parents)):
+            parent = parents[te]
+            self._register(chromosome, te, globals_[parent] if parent else 0)
+
+
+@dataclass
+class Shard:
+    """A chromosome and the operations to do on it in an epoch."""
+
+    genome: Genome
+    ops: int
+    theta: SimParams
+    insert_weight: float
+    seed: np.random.SeedSequence
+    # The global family of each local TE id known at the start of the epoch
+    families: Sequence[int]
+
+
+# A copy out of a chromosome: the operation index, the local TE id, its
+# length and where the copy goes relative to the chromosome: how far
+# past its end if not negative, how far before its start if negative
+Escape = tuple[int, int, int, int]
+
+
+def run_shard(shard: Shard) -> tuple[Genome, list[Escape]]:
+    """
+    Do the operations of an epoch on a chromosome.
+
+    Operations are picked as in sim_te, except that inserts have the
+    chromosome's share of the insertion weight. Copies that would land
+    outside the chromosome are not done but returned, to be done when
+    the epoch is merged. They are placed relative to the ends of the
+    chromosome as it was when they were made, so what happens in the
+    chromosome later in the epoch doesn't move them back into it.
+    Family-dependent offsets use the families known
+    at the start of the epoch; TEs of a family that started during the
+    epoch get offsets from the default distribution.
+    """
+    genome, theta = shard.genome, shard.theta
+    rng = np.random.default_rng(shard.seed)
+    lengths = as_sampler(theta.te_len)
+    offsets = as_sampler(theta.te_offset)
+    lengths.reset(rng)
+    offsets.reset(rng)
+    family = genome.lineage.family
+
+    escapes: list[Escape] = []
+    _, theta_cpy, theta_dis = theta.weights
+    for t in range(shard.ops):
+        active = genome.active_tes()
+        copy_weight = len(active) * theta_cpy
+        total = shard.insert_weight + copy_weight + len(active) * theta_dis
+        if total == 0:
+            break
+        x = rng.random() * total
+        if x < shard.insert_weight:
+            pos = int(rng.integers(0, len(genome) + 1))
+            genome.insert_te(pos, lengths.draw())
+
+        elif x < shard.insert_weight + copy_weight:
+            te = active[rng.integers(len(active))]
+            root = family[te]
+            known = root < len(shard.families)
+            offset = offsets.draw(shard.families[root] if known else None)
+            if rng.random() < 0.5:
+                offset = -offset
+            start, end = genome.locate_te(te)
+            pos = start + offset
+            if 0 <= pos < len(genome):
+                genome.copy_te(te, offset)
+            else:
+                beyond = pos - len(genome) if pos > 0 else pos
+                escapes.append((t, te, end - start, beyond))
+
+        else:
+            genome.disable_te(active[rng.integers(len(active))])
+
+    return genome, escapes
+
+
+def epoch_sizes(k: int, epochs: int) -> list[int]:
+    """
+    Split k operations into epochs.
+
+    >>> epoch_sizes(10, 3)
+    [4, 3, 3]
+    """
+    return [k // epochs + (e < k % epochs) for e in range(epochs)]
+
+
+def sim_sharded(sizes: Sequence[int], k: int,
+                *,  # the remaining args below must be given by keyword
+                theta: SimParams = SimParams(),
+                seed: int | None = None,
+                genome_class: Type[Genome] = ArrayGenome,
+                epochs: int = 10,
+                executor: Executor | None = None) -> MultiGenome:
+    """
+    Simulate a genome with chromosomes of the given sizes for k operations.
+
+    Each epoch, the chromosomes are sent to the executor to be simulated
+    concurrently, or simulated one by one if there is no executor. With a
+    process pool they are pickled on the way out and back, which all the
+    genome implementations support at any size. The
+    random numbers for chromosome c in epoch e come from their own seed
+    sequence, spawned from seed with the key (e, c + 1), and the division
+    of the operations between chromosomes from the key (e, 0). The epoch
+    is merged chromosome by chromosome, and the copies out of the
+    chromosomes are then done in order of chromosome and operation, so
+    the result is the same for a given seed however it is run.
+
+    With a single epoch the chromosomes evolve completely independently
+    apart from the final copies; with more epochs the division of the
+    operations follows the growth of each chromosome more closely.
+
+    A copy out of a chromosome is made from the TE as it was when the
+    copy was picked, even if the TE is disabled later in the epoch, and
+    is placed as far past the chromosome's end (or before its start) as
+    it was then. The chromosomes it lands in have done the whole epoch by
+    the time it is inserted, so it may end up next to TEs that came
+    after it in the serial order.
+
+    The global id of a new TE, which names its family, isn't known until
+    the epoch is merged, so TE lengths can't depend on the family and
+    raise ValueError if given as ByFamily.
+    """
+    if isinstance(theta.te_len, ByFamily):
+        raise ValueError("sharded simulations can't draw lengths by family")
+    genome = MultiGenome(sizes, genome_class)
+    root = np.random.SeedSequence(seed)
+    theta_ins, theta_cpy, theta_dis = theta.weights
+
+    for e, ops in enumerate(epoch_sizes(k, epochs)):
+        # Divide the operations between the chromosomes by how many
+        # inserts, copies and disables each would get
+        length = len(genome)
+        insert_weights = [theta_ins * len(c) / length
+                          for c in genome.chromosomes]
+        weights = np.array([
+            w + len(c.active_tes()) * (theta_cpy + theta_dis)
+            for w, c in zip(insert_weights, genome.chromosomes)
+        ])
+        if weights.sum() == 0:
+            break
+        rng = np.random.default_rng(
+            np.random.SeedSequence(root.entropy, spawn_key=(e, 0))
+        )
+        counts = rng.multinomial(ops, weights / weights.sum())
+
+        family = np.array(genome.lineage.family, dtype=np.int64)
+        shards = [
+            Shard(chromosome, int(count), theta, insert_weight,
+                  np.random.SeedSequence(root.entropy, spawn_key=(e, c + 1)),
+                  family[np.frombuffer(genome.globals[c], dtype=np.int64)]
+                  .tolist())
+            for c, (chromosome, count, insert_weight) in enumerate(
+                zip(genome.chromosomes, counts, insert_weights)
+            )
+        ]
+        results: Iterable[tuple[Genome, list[Escape]]] = (
+            map(run_shard, shards) if executor is None
+            else executor.map(run_shard, shards)
+        )
+
+        # Everything new in the epoch counts as born at its start
+        start = genome.lineage.ops
+        escapes = []
+        for c, (chromosome, escaped) in enumerate(results):
+            genome.merge(c, chromosome)
+            escapes.extend((c, *escape) for escape in escaped)
+        offsets = genome.offsets()
+        for c, _, te, length, beyond in escapes:
+            if beyond >= 0:
+                pos = offsets[c] + len(genome.chromosomes[c]) + beyond
+            else:
+                pos = offsets[c] + beyond
+            genome._insert(pos % len(genome), length, genome.to_global(c, te))
+            offsets = genome.offsets()
+        genome.lineage.ops = start + ops
+
+    return genome
@@ -0,0 +1,28 @@
+"""Configuration of the tests."""
+
+import pytest
+
+
+def pytest_addoption(parser) -> None:
+    """Add the option for running the scalability tests."""
+    parser.addoption("--scaling", action="store_true",
+                     help="run the tests of how operations scale with n")
+
+
+def pytest_configure(config) -> None:
+    """Register the marker for scalability tests."""
+    config.addinivalue_line(
+        "markers",
+        "scaling: slow tests of how operations scale with the genome "
+        "size, only run with --scaling"
+    )
+
+
+def pytest_collection_modifyitems(config, items) -> None:
+    """Skip the scalability tests unless they were asked for."""
+    if config.getoption("--scaling"):
+        return
+    skip = pytest.mark.skip(reason="scalability test, run with --scaling")
+    for item in items:
+        if "scaling" in item.keywords:
+            item.add_marker(skip)
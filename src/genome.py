@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 from typing import (
-    Generic, TypeVar, Iterable,
+    Generic, TypeVar, Iterable, Iterator,
 )
 from abc import (
     # A tag that says that we can't use this class except by specialising it
@@ -10,6 +10,123 @@ from abc import (
     # A tag that says that this method must be implemented by a child class
     abstractmethod
 )
+import sys
+import struct
+import functools
+from array import array
+import numpy as np
+
+
+class Lineage:
+    """
+    Where the TEs in a genome came from.
+
+    Everything is kept in compact arrays indexed by TE id: parent[te] is
+    the TE that te was copied from (0 if it was inserted ab initio),
+    family[te] the TE that started its family, i.e. the first ancestor
+    that was inserted, and born[te] the index of the operation that
+    created it. Operations are the calls to insert_te, copy_te and
+    disable_te on the genome.
+    """
+
+    def __init__(self):
+        """Create an empty lineage. TE ids start at 1."""
+        self.parent = array('q', [0])
+        self.family = array('q', [0])
+        self.born = array('q', [0])
+        self.ops = 0    # operations done so far
+        self.depth = 0  # nesting of operations calling each other
+
+    def record(self, te: int, parent: int = 0) -> None:
+        """Record a new TE, created by the current operation."""
+        while len(self.parent) <= te:
+            self.parent.append(0)
+            self.family.append(len(self.family))
+            self.born.append(self.ops)
+        self.born[te] = self.ops
+        self.set_parent(te, parent)
+
+    def set_parent(self, te: int, parent: int) -> None:
+        """Record that te was copied from parent."""
+        self.parent[te] = parent
+        self.family[te] = self.family[parent] if parent else te
+
+    def ancestry(self, te: int) -> list[int]:
+        """
+        Get the path from te back to the start of its family.
+
+        >>> lineage = Lineage()
+        >>> lineage.record(1)
+        >>> lineage.record(2, parent=1)
+        >>> lineage.record(3, parent=2)
+        >>> lineage.ancestry(3)
+        [3, 2, 1]
+        """
+        path = [te]
+        while self.parent[te]:
+            te = self.parent[te]
+            path.append(te)
+        return path
+
+    def family_sizes(self, tes: Iterable[int] | None = None) -> dict[int, int]:
+        """
+        Count the TEs in each family.
+
+        Counts all TEs, or only those in tes if given, for example the
+        active ones to get the copy number of each family.
+        """
+        family = np.frombuffer(self.family, dtype=np.int64)
+        if tes is None:
+            family = family[1:]
+        else:
+            family = family[np.fromiter(tes, dtype=np.int64)]
+        families, counts = np.unique(family, return_counts=True)
+        return dict(zip(families.tolist(), counts.tolist()))
+
+    @classmethod
+    def from_arrays(cls, parent: np.ndarray, born: np.ndarray) -> Lineage:
+        """
+        Create a lineage from arrays of parents and operation indices.
+
+        Index 0 is not a TE. Parents must have smaller ids than their
+        copies, as they do when ids are handed out in order.
+        """
+        lineage = cls()
+        parent = np.asarray(parent, dtype=np.int64)
+        lineage.parent = array('q', parent.tobytes())
+        lineage.born = array('q', np.asarray(born, dtype=np.int64).tobytes())
+
+        # Jump to the parent's parent until everyone points to the start
+        # of their family
+        family = np.where(parent == 0, np.arange(len(parent)), parent)
+        while True:
+            jumped = family[family]
+            if np.array_equal(jumped, family):
+                break
+            family = jumped
+        lineage.family = array('q', family.tobytes())
+        lineage.ops = int(lineage.born[-1]) + 1 if len(born) > 1 else 0
+        return lineage
+
+
+def operation(method):
+    """
+    Count calls of a genome operation in its lineage.
+
+    Operations that call other operations, such as copy_te calling
+    insert_te, only count once.
+    """
+    @functools.wraps(method)
+    def counted(self, *args, **kwargs):
+        lineage = self.lineage
+        lineage.depth += 1
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lineage.depth -= 1
+            if lineage.depth == 0:
+                lineage.ops += 1
+    return counted
 
 
 class Genome(ABC):
@@ -17,7 +134,7 @@ class Genome(ABC):
 
     def __init__(self, n: int):
         """Create a genome of size n."""
-        ...  # not implemented yet
+        self.lineage = Lineage()
 
     @abstractmethod
     def insert_te(self, pos: int, length: int) -> int:
@@ -68,6 +185,16 @@ class Genome(ABC):
         """Get the active TE IDs."""
         ...  # not implemented yet
 
+    @abstractmethod
+    def locate_te(self, te: int) -> tuple[int, int] | None:
+        """
+        Get the current coordinates of a TE.
+
+        Returns (start, end) such that the TE covers the positions
+        start, start+1, ..., end-1. If te is not active, return None.
+        """
+        ...  # not implemented yet
+
     @abstractmethod
     def __len__(self) -> int:
         """Get the current length of the genome."""
@@ -88,6 +215,145 @@ class Genome(ABC):
         """
         ...  # not implemented yet
 
+    @abstractmethod
+    def nbytes(self) -> int:
+        """Get the approximate number of bytes used by the genome."""
+        ...  # not implemented yet
+
+    @classmethod
+    @abstractmethod
+    def estimate_nbytes(cls, n: int, length: int, tes: int) -> int:
+        """
+        Estimate the number of bytes a genome would use.
+
+        Estimate the footprint of a genome of this kind created with size
+        n that has grown to the given length and number of TEs (active or
+        disabled), without building it.
+        """
+        ...  # not implemented yet
+
+    @classmethod
+    def estimate_str_nbytes(cls, length: int) -> int:
+        """
+        Estimate the number of bytes str() needs for a genome of a length.
+
+        This covers the string and what is allocated while building it.
+        The default is for building it from a list with an entry per
+        nucleotide.
+        """
+        return sys.getsizeof("") + length * (1 + POINTER_SIZE)
+
+    def ancestry(self, te: int) -> list[int]:
+        """Get the path from te back through the TEs it was copied from."""
+        return self.lineage.ancestry(te)
+
+    def family_sizes(self, active_only: bool = False) -> dict[int, int]:
+        """
+        Count the TEs in each family.
+
+        A family is identified by the TE that was inserted and the rest of
+        the family copied from. With active_only, only active TEs are
+        counted, giving the copy number of each family.
+        """
+        return self.lineage.family_sizes(
+            self.active_tes() if active_only else None
+        )
+
+    def slice(self, start: int, end: int) -> str:
+        """
+        Return the string representation of the window [start, end).
+
+        Since the genome is circular, the window wraps around: start can
+        be negative and end can be larger than the length of the genome.
+
+        This default renders the whole genome and then cuts out the
+        window; implementations that can index into their representation
+        should override it.
+        """
+        genome = str(self)
+        return "".join(
+            genome[lo:hi] for lo, hi in wrap_window(start, end, len(genome))
+        )
+
+    def annotation_at(self, pos: int) -> str:
+        """
+        Get the annotation at position pos.
+
+        The position wraps around, and the annotation is the character
+        used for it in the string representation ('-', 'A' or 'x').
+        """
+        return self.slice(pos, pos + 1)
+
+    def te_segments(self) -> tuple[np.ndarray, np.ndarray,
+                                   np.ndarray, np.ndarray]:
+        """
+        Get the stretches of the genome covered by TEs.
+
+        Returns arrays of TE ids, starts, ends (exclusive) and active
+        flags, sorted by start. Free space is everything in between.
+
+        This default finds the active TEs with locate_te and the disabled
+        stretches in the string representation, which doesn't know which
+        TEs they came from, so disabled stretches get id 0.
+        """
+        ids = self.active_tes()
+        located = [self.locate_te(te) for te in ids]
+
+        # Runs of 'x' in the string
+        codes = np.frombuffer(str(self).encode(), dtype=np.uint8)
+        disabled = np.concatenate(([False], codes == ord('x'), [False]))
+        edges = np.flatnonzero(disabled[1:] != disabled[:-1])
+
+        starts = np.concatenate(
+            ([start for start, _ in located], edges[0::2])
+        ).astype(np.int64)
+        order = np.argsort(starts, kind='stable')
+        return (
+            np.concatenate((ids, np.zeros(len(edges) // 2)))
+            .astype(np.int64)[order],
+            starts[order],
+            np.concatenate(([end for _, end in located], edges[1::2]))
+            .astype(np.int64)[order],
+            np.concatenate((np.ones(len(ids)), np.zeros(len(edges) // 2)))
+            .astype(bool)[order],
+        )
+
+
+POINTER_SIZE = struct.calcsize('P')
+
+
+def object_size(obj: object) -> int:
+    """Get the size of an object, including its instance dictionary."""
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def wrap_window(start: int, end: int, n: int) -> list[tuple[int, int]]:
+    """
+    Split the circular window [start, end) into linear pieces.
+
+    Each piece (lo, hi) satisfies 0 <= lo < hi <= n, and reading the
+    pieces in order gives the window.
+
+    >>> wrap_window(-2, 3, 10)
+    [(8, 10), (0, 3)]
+    >>> wrap_window(12, 14, 10)
+    [(2, 4)]
+    """
+    if end < start:
+        raise ValueError(f"window end {end} is before its start {start}")
+    if n == 0 and end > start:
+        raise IndexError("window in an empty genome")
+    pieces = []
+    while start < end:
+        lo = start % n
+        hi = min(n, lo + end - start)
+        pieces.append((lo, hi))
+        start += hi - lo
+    return pieces
+
 
 class ListGenome(Genome):
     """
@@ -97,12 +363,27 @@ class ListGenome(Genome):
     """
 
     def __init__(self, n: int):
-        """Create a new genome with length n."""
+        """
+        Create a new genome with length n.
+
+        The list of nucleotides isn't built until we first need it, so
+        creating a genome takes constant time.
+        """
+        super().__init__(n)
         #initialize the genome with no TE's yet.
-        self.genome=(['-']*n)
+        self.n = n
+        self.nucleotides: list | None = None
         self.TE = {}
         self.active = []
 
+    @property
+    def genome(self) -> list:
+        """The list of nucleotides, built the first time we need it."""
+        if self.nucleotides is None:
+            self.nucleotides = ['-']*self.n
+        return self.nucleotides
+
+    @operation
     def insert_te(self, pos: int, length: int) -> int:
         """
         Insert a new transposable element.
@@ -122,13 +403,15 @@ class ListGenome(Genome):
             ID = max(self.TE) + 1
         self.TE[ID] = length
         self.active.append(ID)
-        if pos > 1:
+        self.lineage.record(ID)
+        if 0 < pos < len(self):
             if isinstance(self.genome[pos-1], int) and isinstance(self.genome[pos], int):
                 disable_ID = self.genome[pos]
                 self.disable_te(disable_ID)
         self.genome[pos:pos] = [ID]*length
         return ID
 
+    @operation
     def copy_te(self, te: int, offset: int) -> int | None:
         """
         Copy a transposable element.
@@ -149,15 +432,13 @@ class ListGenome(Genome):
             if self.genome[i] == te:
                 start_orginal_te = i
                 break
-        start_copy = start_orginal_te + offset
-        while start_copy not in range(0, len(self)):
-            if start_copy > len(self):
-                start_copy = start_copy-len(self)
-            if start_copy < 0: 
-                start_copy = len(self) + start_copy
-        return self.insert_te(start_copy,self.TE[te])
+        start_copy = (start_orginal_te + offset) % len(self)
+        copy = self.insert_te(start_copy,self.TE[te])
+        self.lineage.set_parent(copy, te)
+        return copy
             
 
+    @operation
     def disable_te(self, te: int) -> None:
         """
         Disable a TE.
@@ -166,6 +447,8 @@ class ListGenome(Genome):
         TEs are already inactive, so there is no need to do anything
         for those.
         """
+        if te not in self.active:
+            return
         self.active.remove(te)
         length = self.TE[te]
         for i in range(len(self)):
@@ -178,9 +461,39 @@ class ListGenome(Genome):
         """Get the active TE IDs."""
         return self.active
 
+    def locate_te(self, te: int) -> tuple[int, int] | None:
+        """Get the current coordinates of a TE."""
+        if te not in self.active:
+            return None
+        start = self.genome.index(te)
+        return start, start + self.TE[te]
+
+    def slice(self, start: int, end: int) -> str:
+        """Return the string representation of the window [start, end)."""
+        return "".join(
+            'A' if isinstance(x, int) else x
+            for lo, hi in wrap_window(start, end, len(self))
+            for x in self.genome[lo:hi]
+        )
+
+    def nbytes(self) -> int:
+        """Get the approximate number of bytes used by the genome."""
+        return sys.getsizeof(self.nucleotides) + sys.getsizeof(self.TE) + \
+            sys.getsizeof(self.active) + len(self.TE) * sys.getsizeof(2**30)
+
+    @classmethod
+    def estimate_nbytes(cls, n: int, length: int, tes: int) -> int:
+        """Estimate the number of bytes a genome would use."""
+        # A pointer per nucleotide, and per TE an int object, its entry
+        # in self.TE and its entry in self.active
+        return sys.getsizeof([]) + length * POINTER_SIZE + \
+            tes * (sys.getsizeof(2**30) + 4 * POINTER_SIZE)
+
     def __len__(self) -> int:
         """Current length of the genome."""
-        return len(self.genome)
+        if self.nucleotides is None:
+            return self.n
+        return len(self.nucleotides)
 
     def __str__(self) -> str:
         """
@@ -203,10 +516,11 @@ class ListGenome(Genome):
         return "".join(genome)
 
 class Node:
-    def __init__(self, te=None, prev = None, next = None):
+    def __init__(self, te=None, prev = None, next = None, count = 1):
         self.te = te
         self.prev = prev
         self.next = next
+        self.count = count # nucleotides in the node, > 1 only for free runs
 
 def insert_last(sequence, te):
     new = Node()
@@ -227,7 +541,7 @@ def insert_next(node, te):
     node.next = new
     new.prev = node
     if new.next is not None:
-        node.next.prev = new
+        new.next.prev = new
     
 
 
@@ -246,24 +560,81 @@ class LinkedListGenome(Genome):
         0: no TEs
         1: active TEs
         2: disabled TEs
+
+        Stretches of free nucleotides are kept in a single node with a
+        count, and only split where TEs are inserted, so the genome starts
+        out as one node no matter how large n is.
         """
         ...  # FIXME
+        super().__init__(n)
 
         # Init variables
         self.id = 0 # TEs ID
         self.active = {} # Active TEs e.g. {id1: [start, end], id2: [start, end]}
         self.length = n # Sequence length
 
-        # Initialize first node LinkedList nucleotide
-        self.nucleotide = Node(0)
+        # Initialize first node LinkedList nucleotide, holding all of them
+        self.nucleotide = Node(0, count=n)
         self.nucleotide.prev = self.nucleotide
         self.nucleotide.next = self.nucleotide
-        
-        # Insert the nucleotide
-        for _ in range(1,n):
-            insert_last(self.nucleotide, 0)
 
+    def __getstate__(self) -> dict:
+        """
+        Get the genome for pickling.
 
+        The nodes are stored as a list of (te, count), since pickling
+        the linked nodes themselves recurses once per node.
+        """
+        state = self.__dict__.copy()
+        nodes = []
+        node = self.nucleotide
+        while True:
+            nodes.append((node.te, node.count))
+            node = node.next
+            if node is self.nucleotide:
+                break
+        state['nucleotide'] = nodes
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore a pickled genome, linking up its nodes again."""
+        nodes = state.pop('nucleotide')
+        self.__dict__.update(state)
+        te, count = nodes[0]
+        self.nucleotide = Node(te, count=count)
+        self.nucleotide.prev = self.nucleotide
+        self.nucleotide.next = self.nucleotide
+        for te, count in nodes[1:]:
+            insert_last(self.nucleotide, te)
+            self.nucleotide.prev.count = count
+
+    def _node_before(self, index: int) -> Node:
+        """
+        Get the node that ends just before position index.
+
+        If position index - 1 is inside a run of free nucleotides, the run
+        is split so a node ends there. Position 0 is preceded by the last
+        node, since the genome is circular.
+        """
+        if index == 0:
+            return self.nucleotide.prev
+
+        node = self.nucleotide
+        end = node.count
+        while end < index:
+            node = node.next
+            end += node.count
+
+        if end > index:
+            # Move the part of the run from index and up to a new node
+            rest = end - index
+            node.count -= rest
+            insert_next(node, 0)
+            node.next.count = rest
+        return node
+
+
+    @operation
     def insert_te(self, pos: int, length: int) -> int:
         """
         Insert a new transposable element.
@@ -279,25 +650,19 @@ class LinkedListGenome(Genome):
         """
         ...  # FIXME
         # Walk to pos
-        current = self.nucleotide.prev
-        start_index = 0
         if pos < 0:
             pos = self.length + pos
-            for _ in range(0,pos):
-                current = current.next
-                start_index += 1
-        else:
-            for _ in range(0,pos):
-                current = current.next
-                start_index += 1
+        start_index = pos
+        current = self._node_before(start_index)
 
         # Save node after the current
         # to reconnect it again afterwards            
+        before = current
         after = current.next
         
         # Disable active TE if it collides with new TE
         for id, [start_te, end_te] in self.active.items():
-            if start_index > start_te and start_index < end_te:
+            if start_index > start_te and start_index <= end_te:
                 self.disable_te(id)
                 break
         
@@ -309,23 +674,29 @@ class LinkedListGenome(Genome):
         # Reconnect the node
         current.next = after
         after.prev = current
+
+        # A TE inserted at position 0 becomes the new start of the genome
+        if start_index == 0:
+            self.nucleotide = before.next
         
         # Update variable
         self.id += 1
         self.length += length
         self.active[self.id] = [start_index, start_index + length - 1]
+        self.lineage.record(self.id)
 
         # function to update self.active after inserting TEs
         for key, [start, _] in self.active.items():
             if self.id == key:
                 pass
             else:
-                if start > start_index:
+                if start >= start_index:
                     self.active[key][0] += length
                     self.active[key][1] += length
 
         return self.id
 
+    @operation
     def copy_te(self, te: int, offset: int) -> int | None:
         """
         Copy a transposable element.
@@ -349,59 +720,13 @@ class LinkedListGenome(Genome):
         [start, end] = self.active[te]
         length = end - start + 1
 
-        # Walk to start index
-        start_index = 0
-        current = self.nucleotide.prev
-        for _ in range(0,start):
-            current = current.next
-            start_index += 1
-
-        # Walk to offset
-        if offset < 0:
-            offset = (self.length +  offset) % self.length
-            for _ in range(0,offset):
-                current = current.next
-            start_index = (start_index + offset) % self.length
-        else:
-            for _ in range(0,offset):
-                current = current.next
-            start_index = start_index + offset
-
-        # Save node after the current
-        # to reconnect it again afterwards            
-        after = current.next
-            
-        # Disable active TE if it collides with new TE
-        for id, [start_te, end_te] in self.active.items():
-            if start_index > start_te and start_index < end_te:
-                self.disable_te(id)
-                break
-        
-        # Copy TE
-        for _ in range(end - start + 1):
-            insert_next(current, 1)
-            current = current.next
-
-        # Reconnect the node
-        current.next = after
-        after.prev = current
-        
-        # Update variable
-        self.id += 1
-        self.length += length
-        self.active[self.id] = [start_index, start_index + length - 1]
-
-        # function to update self.active after inserting TEs
-        for key, [start, _] in self.active.items():
-            if self.id == key:
-                pass
-            else:
-                if start > start_index:
-                    self.active[key][0] += length
-                    self.active[key][1] += length
-
-        return self.id
+        # The copy goes to start + offset, wrapped around the genome;
+        # from there on it is just an insertion
+        copy = self.insert_te((start + offset) % self.length, length)
+        self.lineage.set_parent(copy, te)
+        return copy
 
+    @operation
     def disable_te(self, te: int) -> None:
         """
         Disable a TE.
@@ -415,10 +740,7 @@ class LinkedListGenome(Genome):
             [start, end] = self.active[te]
 
             # Traverse through the linked list
-            current = self.nucleotide.prev
-
-            for _ in range(start + 1):
-                current = current.next
+            current = self._node_before(start).next
 
             for _ in range(end - start + 1):
                 current.te = 2 # disable te
@@ -431,6 +753,33 @@ class LinkedListGenome(Genome):
         # FIXME
         return list(self.active.keys())
 
+    def locate_te(self, te: int) -> tuple[int, int] | None:
+        """Get the current coordinates of a TE."""
+        if te not in self.active:
+            return None
+        [start, end] = self.active[te]
+        return start, end + 1
+
+    def nbytes(self) -> int:
+        """Get the approximate number of bytes used by the genome."""
+        nodes = 1
+        node = self.nucleotide.next
+        while node is not self.nucleotide:
+            nodes += 1
+            node = node.next
+        return nodes * object_size(Node(0)) + \
+            sys.getsizeof(self.active) + \
+            len(self.active) * sys.getsizeof([0, 0])
+
+    @classmethod
+    def estimate_nbytes(cls, n: int, length: int, tes: int) -> int:
+        """Estimate the number of bytes a genome would use."""
+        # A node per TE nucleotide, at most two free runs more per TE,
+        # and a [start, end] list per TE
+        nodes = length - n + 2 * tes + 1
+        return nodes * object_size(Node(0)) + \
+            tes * (sys.getsizeof([0, 0]) + 3 * POINTER_SIZE)
+
     def __len__(self) -> int:
         """Current length of the genome."""
         # FIXME
@@ -449,19 +798,21 @@ class LinkedListGenome(Genome):
         TEs with 'x'.
         """
         node = self.nucleotide
-        out = ""
+        out = []
 
-        for _ in range(self.length):
+        while True:
             # out += str(node.te)
             match node.te:
                 case 0:
-                    out += '-'
+                    out.append('-' * node.count)
                 case 1:
-                    out += 'A'
+                    out.append('A')
                 case 2:
-                    out += 'x'
+                    out.append('x')
             node = node.next
-        return out
+            if node is self.nucleotide:
+                break
+        return "".join(out)
 
 
 
@@ -538,6 +889,26 @@ class DLList(Generic[T]):
         for val in seq:
             insert_after(self.head.prev, val)
 
+    def __iter__(self) -> Iterator[T]:
+        """Iterate over the elements going in the next direction."""
+        link = self.head.next
+        while link is not self.head:
+            yield link.val
+            link = link.next
+
+    def __getstate__(self) -> list[T]:
+        """
+        Get the list for pickling.
+
+        Only the elements are stored, since pickling the links themselves
+        recurses once per link.
+        """
+        return list(self)
+
+    def __setstate__(self, state: list[T]) -> None:
+        """Restore a pickled list."""
+        self.__init__(state)  # type: ignore
+
     def __str__(self) -> str:
         """Get string with the elements going in the next direction."""
         elms: list[str] = []
@@ -548,6 +919,19 @@ class DLList(Generic[T]):
         return f"[{', '.join(elms)}]"
     __repr__ = __str__  # because why not?
 
+class FreeRun:
+    """A stretch of free nucleotides, stored in a single link."""
+
+    def __init__(self, count: int):
+        """Create a run of count free nucleotides."""
+        self.count = count
+
+
+def link_size(link: Link) -> int:
+    """Get the number of nucleotides in a link."""
+    return link.val.count if isinstance(link.val, FreeRun) else 1
+
+
 class LinkedListGenome2(Genome):
     """
     Representation of a genome.
@@ -558,13 +942,39 @@ class LinkedListGenome2(Genome):
     def __init__(self, n: int):
         """
         Create a new genome with length n.
+
+        The free nucleotides start out as a single FreeRun link, which
+        is split where TEs are inserted, so this takes constant time.
         """
-        self.genome = DLList(['-']*n)
+        super().__init__(n)
+        self.genome = DLList([FreeRun(n)] if n > 0 else [])
         self.active = []
         self.TE = {}
+        self.length = n
 
+    def _link_at(self, pos: int) -> Link:
+        """
+        Get the link that starts at position pos.
 
+        If pos is inside a run of free nucleotides, the run is split so a
+        link starts there. For pos == len(self) we get the head.
+        """
+        link = self.genome.head.next
+        start = 0
+        while link is not self.genome.head:
+            size = link_size(link)
+            if start + size > pos:
+                break
+            start += size
+            link = link.next
+
+        if start < pos:
+            # Move the part of the run before pos to a new link
+            insert_before(link, FreeRun(pos - start))
+            link.val.count -= pos - start
+        return link
 
+    @operation
     def insert_te(self, pos: int, length: int) -> int:
         """
         Insert a new transposable element.
@@ -584,36 +994,23 @@ class LinkedListGenome2(Genome):
             ID = max(self.TE) +1
         self.TE[ID] = length
         self.active.append(ID)
-        link = self.genome.head
-        
-        if pos > 0: 
-            link = link.next
-            for _ in range(pos): 
-                link = link.next 
-                if link == self.genome.head:
-                    link = link.next
-       
+        self.lineage.record(ID)
+
         if pos < 0:
-            link = link.prev
-            for _ in range(abs(pos)): 
-                link = link.prev
-                if link == self.genome.head:
-                    link = link.prev
+            pos = len(self) + pos
+        link = self._link_at(pos)
         
         if link != self.genome.head: 
             if isinstance(link.prev.val, int) and isinstance(link.val, int): 
                 self.disable_te(link.val)
         
-        if pos < 0: 
-            for _ in range(length):
-                insert_after(link, ID)
-        else:
-            for _ in range(length):
-                insert_before(link, ID)   
-
+        for _ in range(length):
+            insert_before(link, ID)
+        self.length += length
 
         return ID
 
+    @operation
     def copy_te(self, te: int, offset: int) -> int | None:
         """
         Copy a transposable element.
@@ -631,15 +1028,12 @@ class LinkedListGenome2(Genome):
         if te not in self.active:
             return None
 
-        link = self.genome.head
-        for i in range (len(self)):
-            if link.val == te:
-                pos = i-1
-                break
-            link = link.next
-        
-        return self.insert_te(pos+offset, self.TE[te])
+        start, _ = self.locate_te(te)
+        copy = self.insert_te((start + offset) % len(self), self.TE[te])
+        self.lineage.set_parent(copy, te)
+        return copy
 
+    @operation
     def disable_te(self, te: int) -> None:
         """
         Disable a TE.
@@ -648,11 +1042,11 @@ class LinkedListGenome2(Genome):
         TEs are already inactive, so there is no need to do anything
         for those.
         """
-        link = self.genome.head
-        for _ in range(len(self)): 
+        if te not in self.active:
+            return
+        link = self.genome.head.next
+        while link.val != te:
             link = link.next
-            if link.val == te:
-                break
         for _ in range(self.TE[te]): 
             link.val = 'x'
             link = link.next
@@ -663,14 +1057,40 @@ class LinkedListGenome2(Genome):
         """Get the active TE IDs."""
         return self.active
 
-    def __len__(self) -> int:
-        """Current length of the genome."""
-        acc = 0
+    def locate_te(self, te: int) -> tuple[int, int] | None:
+        """Get the current coordinates of a TE."""
+        if te not in self.active:
+            return None
+        link = self.genome.head.next
+        start = 0
+        while link.val != te:
+            start += link_size(link)
+            link = link.next
+        return start, start + self.TE[te]
+
+    def nbytes(self) -> int:
+        """Get the approximate number of bytes used by the genome."""
+        links = 0
         link = self.genome.head.next
         while link != self.genome.head:
-            acc += 1
+            links += 1
             link = link.next
-        return acc
+        return links * object_size(Link(None, None, None)) + \
+            sys.getsizeof(self.TE) + sys.getsizeof(self.active) + \
+            len(self.TE) * sys.getsizeof(2**30)
+
+    @classmethod
+    def estimate_nbytes(cls, n: int, length: int, tes: int) -> int:
+        """Estimate the number of bytes a genome would use."""
+        # A link per TE nucleotide, at most two free runs more per TE, and
+        # per TE an int object, its entry in self.TE and in self.active
+        links = length - n + 2 * tes + 1
+        return links * object_size(Link(None, None, None)) + \
+            tes * (sys.getsizeof(2**30) + 4 * POINTER_SIZE)
+
+    def __len__(self) -> int:
+        """Current length of the genome."""
+        return self.length
 
     def __str__(self) -> str:
         """
@@ -689,7 +1109,210 @@ class LinkedListGenome2(Genome):
         while link and link is not self.genome.head:
             if isinstance(link.val,int):
                 elms.append('A')
+            elif isinstance(link.val, FreeRun):
+                elms.append('-' * link.val.count)
             else:
                 elms.append(str(link.val))
             link = link.next
         return "".join(elms) 
+
+
+# Characters for free space, active TEs and disabled TEs, as bytes
+SYMBOLS = np.frombuffer(b'-Ax', dtype=np.uint8)
+
+
+class ArrayGenome(Genome):
+    """
+    Representation of a genome.
+
+    Implements the Genome interface using NumPy arrays of TE segments.
+
+    Only the stretches covered by TEs are stored, as four parallel arrays
+    sorted by start: the TE id, start, end (exclusive) and whether it is
+    active. Everything between the segments is free space. An active TE
+    is always a single segment; a disabled TE can be split in several
+    when something is inserted into it.
+    """
+
+    def __init__(self, n: int):
+        """Create a new genome with length n."""
+        super().__init__(n)
+        self.id = 0  # Last TE ID handed out
+        self.length = n
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.starts = np.zeros(0, dtype=np.int64)
+        self.ends = np.zeros(0, dtype=np.int64)
+        self.active = np.zeros(0, dtype=bool)
+
+    @operation
+    def insert_te(self, pos: int, length: int) -> int:
+        """
+        Insert a new transposable element.
+
+        Insert a new transposable element at position pos and len
+        nucleotide forward.
+
+        If the TE collides with an existing TE, i.e. genome[pos]
+        already contains TEs, then that TE should be disabled and
+        removed from the set of active TEs.
+
+        Returns a new ID for the transposable element.
+        """
+        if pos < 0:
+            pos = self.length + pos
+
+        # The segment that starts at or before pos, if there is one
+        i = np.searchsorted(self.starts, pos, side='right') - 1
+        if i >= 0 and self.starts[i] < pos < self.ends[i]:
+            # We land inside segment i, so it is disabled and split in two
+            self.active[i] = False
+            self.ids = np.insert(self.ids, i + 1, self.ids[i])
+            self.starts = np.insert(self.starts, i + 1, pos)
+            self.ends = np.insert(self.ends, i + 1, self.ends[i])
+            self.active = np.insert(self.active, i + 1, False)
+            self.ends[i] = pos
+
+        # Move everything from pos and up out of the way
+        shift = self.starts >= pos
+        self.starts[shift] += length
+        self.ends[shift] += length
+
+        j = np.searchsorted(self.starts, pos)
+        self.id += 1
+        self.ids = np.insert(self.ids, j, self.id)
+        self.starts = np.insert(self.starts, j, pos)
+        self.ends = np.insert(self.ends, j, pos + length)
+        self.active = np.insert(self.active, j, True)
+        self.length += length
+        self.lineage.record(self.id)
+
+        return self.id
+
+    @operation
+    def copy_te(self, te: int, offset: int) -> int | None:
+        """
+        Copy a transposable element.
+
+        Copy the transposable element te to an offset from its current
+        location.
+
+        The offset can be positive or negative; if positive the te is copied
+        upwards and if negative it is copied downwards. If the offset moves
+        the copy left of index 0 or right of the largest index, it should
+        wrap around, since the genome is circular.
+
+        If te is not active, return None (and do not copy it).
+        """
+        location = self.locate_te(te)
+        if location is None:
+            return None
+        start, end = location
+        copy = self.insert_te((start + offset) % self.length, end - start)
+        self.lineage.set_parent(copy, te)
+        return copy
+
+    @operation
+    def disable_te(self, te: int) -> None:
+        """
+        Disable a TE.
+
+        If te is an active TE, then make it inactive. Inactive
+        TEs are already inactive, so there is no need to do anything
+        for those.
+        """
+        self.active[self.ids == te] = False
+
+    def active_tes(self) -> list[int]:
+        """Get the active TE IDs."""
+        return np.sort(self.ids[self.active]).tolist()
+
+    def locate_te(self, te: int) -> tuple[int, int] | None:
+        """Get the current coordinates of a TE."""
+        i = np.flatnonzero((self.ids == te) & self.active)
+        if len(i) == 0:
+            return None
+        return int(self.starts[i[0]]), int(self.ends[i[0]])
+
+    def te_segments(self) -> tuple[np.ndarray, np.ndarray,
+                                   np.ndarray, np.ndarray]:
+        """Get the stretches of the genome covered by TEs."""
+        return self.ids, self.starts, self.ends, self.active
+
+    @classmethod
+    def from_segments(cls, length: int, ids: np.ndarray, starts: np.ndarray,
+                      ends: np.ndarray, active: np.ndarray) -> ArrayGenome:
+        """
+        Create a genome from its TE segments.
+
+        The arrays are used as they are, without copying them, so they
+        must be writable and not shared with anything else. Nothing is
+        known about where the TEs came from, so each starts its own family.
+        """
+        genome = cls(0)
+        genome.length = length
+        genome.id = int(ids.max(initial=0))
+        if genome.id:
+            genome.lineage.record(genome.id)
+        genome.ids, genome.starts = ids, starts
+        genome.ends, genome.active = ends, active
+        return genome
+
+    def slice(self, start: int, end: int) -> str:
+        """Return the string representation of the window [start, end)."""
+        return "".join(
+            self._render(lo, hi) for lo, hi in wrap_window(start, end, len(self))
+        )
+
+    def _render(self, lo: int, hi: int) -> str:
+        """Render the linear stretch [lo, hi) of the genome."""
+        # Only the segments that overlap [lo, hi)
+        a = np.searchsorted(self.ends, lo, side='right')
+        b = np.searchsorted(self.starts, hi)
+        starts = np.clip(self.starts[a:b], lo, hi) - lo
+        ends = np.clip(self.ends[a:b], lo, hi) - lo
+        state = np.where(self.active[a:b], 1, 2).astype(np.int8)
+
+        # Mark where each segment starts and stops and sum up the marks
+        # to get the state of each position
+        marks = np.zeros(hi - lo + 1, dtype=np.int8)
+        np.add.at(marks, starts, state)
+        np.subtract.at(marks, ends, state)
+        states = np.cumsum(marks[:-1], dtype=np.int8)
+        return SYMBOLS[states].tobytes().decode()
+
+    def nbytes(self) -> int:
+        """Get the approximate number of bytes used by the genome."""
+        return self.ids.nbytes + self.starts.nbytes + \
+            self.ends.nbytes + self.active.nbytes
+
+    @classmethod
+    def estimate_nbytes(cls, n: int, length: int, tes: int) -> int:
+        """Estimate the number of bytes a genome would use."""
+        # Splitting disabled TEs gives at most two segments per TE, and
+        # a segment is three int64 and a bool. The length doesn't matter.
+        return 2 * tes * (3 * 8 + 1)
+
+    @classmethod
+    def estimate_str_nbytes(cls, length: int) -> int:
+        """Estimate the number of bytes str() needs for a genome."""
+        # The marks, states and symbols arrays and the bytes they become
+        # are a byte per nucleotide each, and so is the string
+        return sys.getsizeof("") + 5 * length
+
+    def __len__(self) -> int:
+        """Current length of the genome."""
+        return self.length
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of the genome.
+
+        Create a string that represents the genome. By nature, it will be
+        linear, but imagine that the last character is immidiatetly followed
+        by the first.
+
+        The genome should start at position 0. Locations with no TE should be
+        represented with the character '-', active TEs with 'A', and disabled
+        TEs with 'x'.
+        """
+        return self._render(0, self.length)
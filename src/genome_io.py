@@ -0,0 +1,106 @@
+"""
+Compact binary files for genomes.
+
+Rather than one character per nucleotide, a genome is stored as its TE
+segments: a header with the genome length and the number of segments,
+followed by arrays of TE ids, starts, ends and active flags. Free space
+is implicit, so a file takes 25 bytes per segment regardless of how
+long the TEs and the stretches between them are.
+
+Loading maps the file into memory and reads the arrays straight out
+of it, so for ArrayGenome nothing is copied until the genome is
+modified. Other implementations are rebuilt by inserting the TEs.
+"""
+
+from __future__ import annotations
+import mmap
+import os
+import struct
+from typing import Type
+import numpy as np
+from genome import Genome, ArrayGenome
+
+MAGIC = b'TEG\0'
+VERSION = 1
+
+# Magic, version, genome length and number of segments. It is 24 bytes,
+# so the int64 arrays that follow are aligned.
+HEADER = struct.Struct('<4sIqq')
+
+# Types of the ids, starts, ends and active arrays
+DTYPES = [np.dtype('<i8'), np.dtype('<i8'), np.dtype('<i8'), np.dtype('?')]
+
+
+def to_bytes(genome: Genome) -> bytes:
+    """Get the binary representation of a genome."""
+    segments = genome.te_segments()
+    parts = [HEADER.pack(MAGIC, VERSION, len(genome), len(segments[0]))]
+    for array, dtype in zip(segments, DTYPES):
+        parts.append(np.ascontiguousarray(array, dtype=dtype).tobytes())
+    return b''.join(parts)
+
+
+def from_buffer(buffer, genome_class: Type[Genome] = ArrayGenome) -> Genome:
+    """
+    Create a genome from its binary representation.
+
+    Any object supporting the buffer protocol works. If the buffer is
+    writable, an ArrayGenome uses it directly instead of copying it.
+    """
+    magic, version, length, nseg = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("not a genome file")
+    if version != VERSION:
+        raise ValueError(f"unsupported genome file version {version}")
+
+    segments = []
+    offset = HEADER.size
+    for dtype in DTYPES:
+        array = np.frombuffer(buffer, dtype=dtype, count=nseg, offset=offset)
+        if not array.flags.writeable:
+            array = array.copy()
+        segments.append(array)
+        offset += array.nbytes
+
+    if issubclass(genome_class, ArrayGenome):
+        return genome_class.from_segments(length, *segments)
+    return rebuild(genome_class, length, *segments)
+
+
+def rebuild(genome_class: Type[Genome], length: int, ids: np.ndarray,
+            starts: np.ndarray, ends: np.ndarray,
+            active: np.ndarray) -> Genome:
+    """
+    Build a genome of any kind from its TE segments.
+
+    We start with the free space and insert the segments from left to
+    right, at their final positions, so the TEs get new ids in the order
+    they appear in the genome.
+    """
+    genome = genome_class(length - int((ends - starts).sum()))
+    for start, end, is_active in zip(starts.tolist(), ends.tolist(),
+                                     active.tolist()):
+        te = genome.insert_te(start, end - start)
+        if not is_active:
+            genome.disable_te(te)
+    return genome
+
+
+def dump(genome: Genome, path: str | os.PathLike) -> None:
+    """Write a genome to a file."""
+    with open(path, 'wb') as f:
+        f.write(to_bytes(genome))
+
+
+def load(path: str | os.PathLike,
+         genome_class: Type[Genome] = ArrayGenome) -> Genome:
+    """
+    Read a genome from a file.
+
+    The file is mapped copy-on-write, so the genome can be modified
+    without changing the file, and pages are only copied when it is.
+    """
+    with open(path, 'rb') as f:
+        return from_buffer(
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY), genome_class
+        )
@@ -0,0 +1,218 @@
+"""
+A compiled simulation loop for transposable elements.
+
+The whole simulation, from picking operations to updating the TE
+segments, runs in one function over NumPy arrays. If numba is installed
+the function is compiled to native code; if not, the very same function
+runs as plain Python, so the results for a given seed do not depend on
+whether the compiled version is available.
+
+All the random numbers are drawn up front from a NumPy generator, and
+the loop only does integer and float arithmetic on them.
+"""
+
+from __future__ import annotations
+from typing import TYPE_CHECKING
+import numpy as np
+from genome import ArrayGenome, Lineage
+from samplers import ByFamily, as_sampler
+
+if TYPE_CHECKING:
+    from simulate import SimParams
+
+try:
+    from numba import njit
+    COMPILED = True
+except ImportError:
+    COMPILED = False
+
+    def njit(**kwargs):  # type: ignore
+        """Leave the function as plain Python when numba is missing."""
+        return lambda f: f
+
+
+# Indices into the kernel's state array
+NSEG, NACT, LENGTH, LAST_ID = 0, 1, 2, 3
+
+
+def draw(k: int, theta: SimParams, seed: int | None) -> tuple[np.ndarray, ...]:
+    """
+    Draw all the random numbers for k operations.
+
+    Returns uniform numbers for choosing the operation, the position and
+    the TE, and the lengths and signed offsets. The kernel doesn't track
+    TE families, so distributions that depend on the family raise
+    ValueError.
+    """
+    for dist in (theta.te_len, theta.te_offset):
+        if isinstance(dist, ByFamily):
+            raise ValueError("the kernel engine doesn't track TE families")
+    rng = np.random.default_rng(seed)
+    op_u = rng.random(k)
+    pos_u = rng.random(k)
+    te_u = rng.random(k)
+    lengths = as_sampler(theta.te_len).fill(k, rng)
+    offsets = as_sampler(theta.te_offset).fill(k, rng)
+    offsets[rng.random(k) < 0.5] *= -1
+    return op_u, pos_u, te_u, lengths, offsets
+
+
+@njit(cache=True)
+def _disable(te, ids, active, state, act):
+    """Disable te, both in the segments and in the sorted active list."""
+    for i in range(state[NSEG]):
+        if ids[i] == te:
+            active[i] = False
+    nact = state[NACT]
+    j = 0
+    while act[j] != te:
+        j += 1
+    for i in range(j, nact - 1):
+        act[i] = act[i + 1]
+    state[NACT] = nact - 1
+
+
+@njit(cache=True)
+def _make_room(i, ids, starts, ends, active, state):
+    """Move segments i and up one index up, leaving room at i."""
+    for j in range(state[NSEG], i, -1):
+        ids[j] = ids[j - 1]
+        starts[j] = starts[j - 1]
+        ends[j] = ends[j - 1]
+        active[j] = active[j - 1]
+    state[NSEG] += 1
+
+
+@njit(cache=True)
+def _insert(pos, length, ids, starts, ends, active, state, act):
+    """Insert a new TE at pos, with the same rules as ArrayGenome."""
+    nseg = state[NSEG]
+
+    # Binary search for the last segment starting at or before pos
+    lo, hi = 0, nseg
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if starts[mid] <= pos:
+            lo = mid + 1
+        else:
+            hi = mid
+    i = lo - 1
+
+    if i >= 0 and starts[i] < pos < ends[i]:
+        if active[i]:
+            _disable(ids[i], ids, active, state, act)
+        _make_room(i + 1, ids, starts, ends, active, state)
+        ids[i + 1] = ids[i]
+        starts[i + 1] = pos
+        ends[i + 1] = ends[i]
+        active[i + 1] = False
+        ends[i] = pos
+
+    # The first segment starting at or after pos
+    j = i + 1 if i >= 0 and starts[i] < pos else max(i, 0)
+    for s in range(j, state[NSEG]):
+        starts[s] += length
+        ends[s] += length
+
+    _make_room(j, ids, starts, ends, active, state)
+    state[LAST_ID] += 1
+    ids[j] = state[LAST_ID]
+    starts[j] = pos
+    ends[j] = pos + length
+    active[j] = True
+    state[LENGTH] += length
+
+    act[state[NACT]] = state[LAST_ID]
+    state[NACT] += 1
+
+
+@njit(cache=True)
+def simulate_kernel(n, weights, op_u, pos_u, te_u, lengths, offsets):
+    """
+    Run the simulation on a genome of initial size n.
+
+    Returns the state array, the segment arrays (ids, starts, ends,
+    active), of which the first state[NSEG] entries are in use, and the
+    parent and creating operation of each TE, indexed by TE id.
+    """
+    k = len(op_u)
+    # Every operation adds at most two segments
+    cap = 2 * k + 1
+    ids = np.zeros(cap, dtype=np.int64)
+    starts = np.zeros(cap, dtype=np.int64)
+    ends = np.zeros(cap, dtype=np.int64)
+    active = np.zeros(cap, dtype=np.bool_)
+    act = np.zeros(k + 1, dtype=np.int64)
+    parent = np.zeros(k + 1, dtype=np.int64)
+    born = np.zeros(k + 1, dtype=np.int64)
+    state = np.zeros(4, dtype=np.int64)
+    state[LENGTH] = n
+
+    w_ins, w_cpy, w_dis = weights[0], weights[1], weights[2]
+    for t in range(k):
+        # The same weighting of the operations as in sim_te
+        nact = state[NACT]
+        total = w_ins + nact * w_cpy + nact * w_dis
+        if total <= 0:
+            # As random.choices in sim_te, rather than disable nothing
+            raise ValueError("Total of weights must be greater than zero")
+        x = op_u[t] * total
+        if x < w_ins:
+            pos = int(pos_u[t] * (state[LENGTH] + 1))
+            _insert(pos, lengths[t], ids, starts, ends, active, state, act)
+            born[state[LAST_ID]] = t
+
+        elif x < w_ins + nact * w_cpy:
+            te = act[int(te_u[t] * nact)]
+            for i in range(state[NSEG]):
+                if ids[i] == te and active[i]:
+                    break
+            pos = (starts[i] + offsets[t]) % state[LENGTH]
+            _insert(pos, ends[i] - starts[i],
+                    ids, starts, ends, active, state, act)
+            parent[state[LAST_ID]] = te
+            born[state[LAST_ID]] = t
+
+        else:
+            te = act[int(te_u[t] * nact)]
+            _disable(te, ids, active, state, act)
+
+    return state, ids, starts, ends, active, parent, born
+
+
+def estimate_nbytes(k: int) -> int:
+    """
+    Estimate the number of bytes run_kernel uses for k operations.
+
+    Unlike the genome classes, the kernel allocates for the worst case up
+    front, so this only depends on k: five arrays of draws, and a sign
+    mask while drawing, the segment arrays for 2k + 1 segments, the
+    active, parent and operation arrays, and the copies of the segments
+    and the lineage made for the returned genome.
+    """
+    draws = 5 * 8 * k + 8 * k + k
+    segments = (2 * k + 1) * (3 * 8 + 1)
+    tes = 3 * 8 * (k + 1)
+    lineage = 5 * 8 * (k + 1)
+    return draws + 2 * segments + tes + lineage
+
+
+def run_kernel(n: int, k: int, theta: SimParams,
+               seed: int | None = None) -> ArrayGenome:
+    """Simulate a genome of initial size n for k operations."""
+    op_u, pos_u, te_u, lengths, offsets = draw(k, theta, seed)
+    state, ids, starts, ends, active, parent, born = simulate_kernel(
+        n, np.array(theta.weights, dtype=np.float64),
+        op_u, pos_u, te_u, lengths, offsets
+    )
+
+    nseg = state[NSEG]
+    genome = ArrayGenome.from_segments(
+        int(state[LENGTH]), ids[:nseg].copy(), starts[:nseg].copy(),
+        ends[:nseg].copy(), active[:nseg].copy()
+    )
+    genome.id = int(state[LAST_ID])
+    genome.lineage = Lineage.from_arrays(parent[:genome.id + 1],
+                                         born[:genome.id + 1])
+    genome.lineage.ops = k
+    return genome
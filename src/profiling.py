@@ -0,0 +1,184 @@
+"""
+Profiling the genome operations during a simulation.
+
+A Profiler wraps the operations of a genome class, so every call of
+insert_te, copy_te, disable_te, active_tes and len() on it is timed,
+including calls that one operation makes to another. Give it to sim_te
+to profile a simulation:
+
+    profiler = Profiler(trace=True, sample_interval=0.001)
+    sim_te(100_000, 1000, genome_class=LinkedListGenome, profile=profiler)
+    profiler.write_collapsed("sim.folded")
+    profiler.write_chrome_trace("sim.json")
+
+The collapsed stacks have one line per stack of operations with the time
+spent in the innermost one, in microseconds, which is the input that
+flamegraph.pl and speedscope take. The Chrome trace has every call as an
+event and can be opened in chrome://tracing or Perfetto. Keeping every
+call costs memory, so it is only done with trace=True.
+
+With a sample_interval, a thread also looks at what the simulation is
+doing every sample_interval seconds while it is inside an operation, and
+counts the lines it finds it at. Those counts show where the time goes
+inside an operation, e.g. how much of LinkedListGenome.copy_te is spent
+walking the list to the TE and how much walking on to the offset.
+"""
+
+from __future__ import annotations
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Iterator, Type
+from genome import Genome, operation
+
+# The genome methods that are profiled
+METHODS = ['insert_te', 'copy_te', 'disable_te', 'active_tes', '__len__']
+
+
+class Profiler:
+    """Timing of genome operations, by the stack of operations they are in."""
+
+    def __init__(self, trace: bool = False,
+                 sample_interval: float | None = None):
+        """
+        Create a profiler.
+
+        With trace, every call is kept for the Chrome trace. With a
+        sample_interval (in seconds), the lines being run are sampled.
+        """
+        self.trace = trace
+        self.sample_interval = sample_interval
+        self.stack: list[str] = []     # the operations we are in
+        self.children: list[int] = []  # time in calls from each of them
+        self.times: dict[tuple[str, ...], int] = defaultdict(int)
+        self.calls: dict[str, int] = defaultdict(int)
+        self.events: list[tuple[str, int, int]] = []
+        self.samples: dict[tuple[str, ...], int] = defaultdict(int)
+
+    def wrap(self, name: str, method: Callable) -> Callable:
+        """Time the calls of a method under the given name."""
+        @functools.wraps(method)
+        def profiled(genome, *args, **kwargs):
+            self.stack.append(name)
+            self.children.append(0)
+            start = time.perf_counter_ns()
+            try:
+                return method(genome, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter_ns() - start
+                # Only the time not spent in other operations is our own
+                self.times[tuple(self.stack)] += elapsed - self.children.pop()
+                self.calls[name] += 1
+                self.stack.pop()
+                if self.children:
+                    self.children[-1] += elapsed
+                if self.trace:
+                    self.events.append((name, start, elapsed))
+        return profiled
+
+    def profile_class(self, genome_class: Type[Genome]) -> Type[Genome]:
+        """Get a subclass of genome_class with its operations profiled."""
+        methods = {
+            name: self.wrap(f"{genome_class.__name__}.{name}",
+                            getattr(genome_class, name))
+            for name in METHODS
+        }
+        return type(genome_class.__name__, (genome_class,), methods)
+
+    @contextlib.contextmanager
+    def sampling(self) -> Iterator[None]:
+        """Sample the lines run by this thread while in the with block."""
+        if self.sample_interval is None:
+            yield
+            return
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=self._sample, args=(threading.get_ident(), stop),
+            daemon=True
+        )
+        sampler.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            sampler.join()
+
+    def _sample(self, thread: int, stop: threading.Event) -> None:
+        """Sample the lines run by thread until stop is set."""
+        while not stop.wait(self.sample_interval):
+            frame = sys._current_frames().get(thread)
+            stack: list[str] = []
+            outermost = None
+            while frame is not None:
+                if frame.f_code in WRAPPERS:
+                    # Everything outside the outermost operation is the
+                    # simulation itself
+                    outermost = len(stack)
+                else:
+                    code = frame.f_code
+                    line = frame.f_lineno or code.co_firstlineno
+                    stack.append(f"{code.co_name} "
+                                 f"({os.path.basename(code.co_filename)}:"
+                                 f"{line})")
+                frame = frame.f_back
+            if outermost:
+                self.samples[tuple(reversed(stack[:outermost]))] += 1
+
+    def self_times(self) -> dict[str, int]:
+        """Get the time in nanoseconds spent in each operation itself."""
+        times: dict[str, int] = defaultdict(int)
+        for stack, t in self.times.items():
+            times[stack[-1]] += t
+        return dict(times)
+
+    def collapsed(self, samples: bool = False) -> list[str]:
+        """
+        Get the profile as collapsed stacks.
+
+        Each line is a stack of operations separated by ';' and the time
+        spent in the innermost operation, in microseconds. With samples,
+        the stacks are the lines seen by the sampler instead, with the
+        number of times each was seen.
+        """
+        if samples:
+            counts = self.samples
+        else:
+            counts = {stack: t // 1000 for stack, t in self.times.items()}
+        return [f"{';'.join(stack)} {n}" for stack, n in counts.items()]
+
+    def write_collapsed(self, path: str, samples: bool = False) -> None:
+        """Write the collapsed stacks to path."""
+        with open(path, 'w') as f:
+            f.writelines(line + '\n' for line in self.collapsed(samples))
+
+    def chrome_trace(self) -> dict:
+        """Get the calls in Chrome's trace event format."""
+        if not self.trace:
+            raise ValueError("the calls are only kept with trace=True")
+        pid = os.getpid()
+        return {
+            'traceEvents': [
+                {'name': name, 'cat': 'genome', 'ph': 'X',
+                 'ts': start / 1000, 'dur': elapsed / 1000,
+                 'pid': pid, 'tid': 0}
+                for name, start, elapsed in self.events
+            ],
+            'displayTimeUnit': 'ns',
+        }
+
+    def write_chrome_trace(self, path: str) -> None:
+        """Write the calls to path in Chrome's trace event format."""
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+# The code of the wrappers around the operations, which the sampler skips
+WRAPPERS = {
+    Profiler().wrap('', lambda genome: None).__code__,
+    operation(lambda genome: None).__code__,
+}
@@ -0,0 +1,277 @@
+"""
+Distributions for TE lengths and offsets.
+
+A Sampler draws positive integers. Rather than asking NumPy for one
+number at a time, it draws a large buffer in one vectorised call and
+hands the numbers out one by one, refilling the buffer when it runs
+out, so the cost per draw is a few attribute lookups.
+
+Samplers draw from np.random unless given another generator with
+reset(), so seeding np.random (as sim_te does) makes them reproducible.
+"""
+
+from __future__ import annotations
+import math
+from abc import ABC, abstractmethod
+from typing import Callable, Mapping, Sequence
+import numpy as np
+
+# np.random itself has the same sampling functions as a RandomState
+RandomSource = np.random.Generator | np.random.RandomState
+
+
+class Sampler(ABC):
+    """A buffered distribution over positive integers."""
+
+    def __init__(self, buffer_size: int = 4096):
+        """Create a sampler that draws buffer_size numbers at a time."""
+        self.buffer_size = buffer_size
+        self.reset()
+
+    def reset(self, rng: RandomSource = np.random,  # type: ignore
+              initial_size: int | None = None) -> None:
+        """
+        Throw away buffered numbers and draw from rng from now on.
+
+        If initial_size is given, the next buffer holds that many numbers
+        and every buffer after that twice as many as the one before, up
+        to buffer_size, so a sampler that is only used a few times only
+        draws a few numbers.
+        """
+        self.rng = rng
+        self.buffer = np.zeros(0, dtype=np.int64)
+        self.next = 0
+        self.fill_size = min(initial_size or self.buffer_size,
+                             self.buffer_size)
+
+    def draw(self, family: int | None = None) -> int:
+        """Draw a number, for a TE of the given family if it matters."""
+        if self.next == len(self.buffer):
+            self.buffer = self.fill(self.fill_size, self.rng)
+            self.fill_size = min(2 * self.fill_size, self.buffer_size)
+            self.next = 0
+        x = self.buffer[self.next]
+        self.next += 1
+        return int(x)
+
+    @abstractmethod
+    def fill(self, size: int, rng: RandomSource) -> np.ndarray:
+        """Draw size numbers from rng in one go."""
+        ...  # not implemented yet
+
+    @abstractmethod
+    def mean(self) -> float:
+        """Get the mean of the distribution."""
+        ...  # not implemented yet
+
+    @abstractmethod
+    def cache_key(self) -> str:
+        """
+        Get a key that identifies the distribution.
+
+        Samplers with the same key must draw the same numbers from the
+        same generator, so simulations with them can share cached
+        results. That includes the buffer size, since samplers draw
+        their buffers from a generator they share. Raise ValueError if
+        the sampler can't be identified.
+        """
+        ...  # not implemented yet
+
+
+class Geometric(Sampler):
+    """
+    Geometric distribution with a given mean.
+
+    >>> Geometric(200).mean()
+    200
+    """
+
+    def __init__(self, mean: float, buffer_size: int = 4096):
+        """Create a geometric distribution with the given mean."""
+        self.m = mean
+        super().__init__(buffer_size)
+
+    def fill(self, size: int, rng: RandomSource) -> np.ndarray:
+        """Draw size numbers from rng in one go."""
+        return rng.geometric(1/self.m, size=size)
+
+    def mean(self) -> float:
+        """Get the mean of the distribution."""
+        return self.m
+
+    def cache_key(self) -> str:
+        """
+        Get a key that identifies the distribution.
+
+        >>> Geometric(200).cache_key() == Geometric(200.0).cache_key()
+        True
+        """
+        return f"Geometric({float(self.m)!r}, buffer_size={self.buffer_size})"
+
+    def __repr__(self) -> str:
+        """Show the distribution and its parameters."""
+        return f"Geometric({self.m!r})"
+
+
+class LogNormal(Sampler):
+    """
+    Log-normal distribution, rounded to positive integers.
+
+    It is given by its mean and the standard deviation sigma of the
+    underlying normal distribution.
+    """
+
+    def __init__(self, mean: float, sigma: float, buffer_size: int = 4096):
+        """Create a log-normal distribution with the given mean."""
+        self.m = mean
+        self.sigma = sigma
+        self.mu = math.log(mean) - sigma**2 / 2
+        super().__init__(buffer_size)
+
+    def fill(self, size: int, rng: RandomSource) -> np.ndarray:
+        """Draw size numbers from rng in one go."""
+        x = np.rint(rng.lognormal(self.mu, self.sigma, size=size))
+        return np.maximum(x, 1).astype(np.int64)
+
+    def mean(self) -> float:
+        """Get the mean of the distribution."""
+        return self.m
+
+    def cache_key(self) -> str:
+        """Get a key that identifies the distribution."""
+        return (f"LogNormal({float(self.m)!r}, {float(self.sigma)!r}, "
+                f"buffer_size={self.buffer_size})")
+
+    def __repr__(self) -> str:
+        """Show the distribution and its parameters."""
+        return f"LogNormal({self.m!r}, {self.sigma!r})"
+
+
+class Empirical(Sampler):
+    """
+    Distribution given by a histogram, e.g. of a real TE family.
+
+    >>> Empirical([100, 300], [3, 1]).mean()
+    150.0
+    """
+
+    def __init__(self, values: Sequence[int], counts: Sequence[float],
+                 buffer_size: int = 4096):
+        """Create a distribution where values[i] has weight counts[i]."""
+        self.values = np.asarray(values, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.float64)
+        self.p = self.counts / self.counts.sum()
+        super().__init__(buffer_size)
+
+    def fill(self, size: int, rng: RandomSource) -> np.ndarray:
+        """Draw size numbers from rng in one go."""
+        return rng.choice(self.values, size=size, p=self.p)
+
+    def mean(self) -> float:
+        """Get the mean of the distribution."""
+        return float(self.values @ self.p)
+
+    def cache_key(self) -> str:
+        """Get a key that identifies the distribution."""
+        return (f"Empirical({self.values.tolist()!r}, {self.p.tolist()!r}, "
+                f"buffer_size={self.buffer_size})")
+
+    def __repr__(self) -> str:
+        """Show the distribution and its parameters."""
+        return f"Empirical({self.values.tolist()!r}, {self.counts.tolist()!r})"
+
+
+# The first buffer size of the samplers ByFamily creates for families
+FAMILY_BUFFER_SIZE = 16
+
+
+class ByFamily(Sampler):
+    """
+    Different distributions for different TE families.
+
+    A TE's family is the id of the TE it was originally inserted as;
+    copies belong to the family of the TE they were copied from. The
+    samplers are given as a mapping from family to sampler, or as a
+    function that creates the sampler for a family the first time it is
+    needed. The default is used for other families and for draws that
+    aren't for a particular family.
+
+    An inserted TE starts a family of its own, so its length is drawn for
+    the family named by the id it is about to get.
+    """
+
+    def __init__(self, samplers: Mapping[int, Sampler] |
+                 Callable[[int], Sampler], default: Sampler):
+        """Create a distribution that depends on the TE family."""
+        self.samplers = samplers
+        self.default = default
+        self.created: dict[int, Sampler] = {}
+        super().__init__()
+
+    def reset(self, rng: RandomSource = np.random,  # type: ignore
+              initial_size: int | None = None) -> None:
+        """Throw away buffered numbers and draw from rng from now on."""
+        super().reset(rng, initial_size)
+        self.created = {}
+        self.default.reset(rng)
+        if isinstance(self.samplers, Mapping):
+            for sampler in self.samplers.values():
+                sampler.reset(rng)
+
+    def _sampler(self, family: int | None) -> Sampler:
+        """Get the sampler for a family."""
+        if family is None:
+            return self.default
+        if isinstance(self.samplers, Mapping):
+            return self.samplers.get(family, self.default)
+        if family not in self.created:
+            # There can be a family per TE, most of which only draw a
+            # few numbers, so they start out with small buffers
+            self.created[family] = self.samplers(family)
+            self.created[family].reset(self.rng, FAMILY_BUFFER_SIZE)
+        return self.created[family]
+
+    def draw(self, family: int | None = None) -> int:
+        """Draw a number, for a TE of the given family if it matters."""
+        return self._sampler(family).draw()
+
+    def fill(self, size: int, rng: RandomSource) -> np.ndarray:
+        """Draw size numbers, not for any particular family."""
+        return self.default.fill(size, rng)
+
+    def mean(self) -> float:
+        """Get the mean of the default distribution."""
+        return self.default.mean()
+
+    def cache_key(self) -> str:
+        """
+        Get a key that identifies the distributions.
+
+        Only samplers given as a mapping can be identified; a function
+        that creates them can't.
+        """
+        if not isinstance(self.samplers, Mapping):
+            raise ValueError(
+                "ByFamily with samplers from a function has no cache key"
+            )
+        samplers = ", ".join(
+            f"{family!r}: {sampler.cache_key()}"
+            for family, sampler in sorted(self.samplers.items())
+        )
+        return f"ByFamily({{{samplers}}}, {self.default.cache_key()})"
+
+    def __repr__(self) -> str:
+        """Show the distributions."""
+        return f"ByFamily({self.samplers!r}, {self.default!r})"
+
+
+def as_sampler(dist: float | Sampler) -> Sampler:
+    """
+    Get a sampler for a simulation parameter.
+
+    Numbers are taken as the mean of a geometric distribution, as
+    SimParams has always used them.
+    """
+    if isinstance(dist, Sampler):
+        return dist
+    return Geometric(dist)
@@ -1,24 +1,40 @@
 """A simulator of tandem repeats."""
 
 from __future__ import annotations
+import contextlib
 import random as rand
+import resource
+import sys
+import timeit
+import tracemalloc
 import numpy as np
 from enum import Enum
 from typing import Type
 from genome import (
     Genome,
     ListGenome,
-    LinkedListGenome
+    LinkedListGenome,
+    LinkedListGenome2,
+    ArrayGenome
 )
+from samplers import Sampler, as_sampler
+from profiling import Profiler
 from dataclasses import dataclass
 
 
+# Bump this when a change to the simulator changes its results for a
+# given seed, so cached results from earlier versions are not reused
+ENGINE_VERSION = 4
+
+
 @dataclass
 class SimParams:
     """Holds simulation parameters."""
 
-    te_len: int = 200       # mean te length
-    te_offset: int = 500    # mean te move
+    # te length and move, either as the mean of a geometric distribution
+    # or as any other distribution from samplers.py
+    te_len: int | Sampler = 200
+    te_offset: int | Sampler = 500
 
     # weight between insert,copy,disable
     weights: tuple[float, float, float] = (0.1, 2.0, 1.0)
@@ -37,55 +53,202 @@ class Ops(Enum):
         return rand.choices(list(Ops), weights)[0]
 
 
+# The implementations sim_te picks from when it isn't given one
+GENOME_CLASSES: list[Type[Genome]] = [
+    ListGenome, LinkedListGenome, LinkedListGenome2, ArrayGenome
+]
+
+
+def project_growth(n: int, k: int, theta: SimParams) -> tuple[int, int]:
+    """
+    Project the genome length and number of TEs after k operations.
+
+    Follows the expected number of active TEs through the operations,
+    ignoring collisions, and counts te_len nucleotides for every expected
+    insertion or copy.
+
+    >>> project_growth(1000, 0, SimParams())
+    (1000, 0)
+    >>> project_growth(1000, 1, SimParams(te_len=10))
+    (1010, 1)
+    """
+    theta_ins, theta_cpy, theta_dis = theta.weights
+    active = tes = 0.0
+    for _ in range(k):
+        total = theta_ins + active * (theta_cpy + theta_dis)
+        new = (theta_ins + active * theta_cpy) / total
+        tes += new
+        active += new - active * theta_dis / total
+    return n + round(tes * as_sampler(theta.te_len).mean()), round(tes)
+
+
+def choose_genome_class(n: int, k: int, theta: SimParams,
+                        genome_class: Type[Genome] | None = None,
+                        memory_budget: int | None = None) -> Type[Genome]:
+    """
+    Pick a genome implementation for a simulation.
+
+    If genome_class is given, it is checked against the memory budget;
+    otherwise the implementation in GENOME_CLASSES with the smallest
+    projected footprint is picked. Raises MemoryError if the projected
+    footprint is over the budget.
+
+    The footprint is the genome itself plus the string that sim_te
+    returns and what it takes to build it, since both are alive at the
+    end of the simulation.
+    """
+    length, tes = project_growth(n, k, theta)
+    candidates = GENOME_CLASSES if genome_class is None else [genome_class]
+
+    def footprint(cls: Type[Genome]) -> int:
+        """Get the projected footprint of an implementation."""
+        return cls.estimate_nbytes(n, length, tes) + \
+            cls.estimate_str_nbytes(length)
+
+    best = min(candidates, key=footprint)
+    if memory_budget is not None:
+        check_budget(best.__name__, footprint(best), memory_budget)
+    return best
+
+
+def check_budget(name: str, needed: int, memory_budget: int) -> None:
+    """Raise MemoryError if what name needs is over the budget."""
+    if needed > memory_budget:
+        raise MemoryError(
+            f"{name} is projected to use {needed} bytes, "
+            f"more than the budget of {memory_budget}"
+        )
+
+
 def sim_te(n: int, k: int,
            *,  # the remaining args below must be given by keyword
            theta: SimParams = SimParams(),
            seed: int | None = None,
-           genome_class: Type[Genome] = ListGenome) -> str:
+           genome_class: Type[Genome] | None = ListGenome,
+           engine: str = "python",
+           memory_budget: int | None = None,
+           profile: Profiler | None = None) -> str:
     """Simulate a genome of initial size n for k operations.
 
+    With engine="kernel" the whole simulation runs in the compiled loop
+    from kernel.py (or its pure Python fallback, with identical results)
+    and genome_class is not used.
+
+    If memory_budget (in bytes) is given, the projected footprint of the
+    genome must fit in it or we raise MemoryError before simulating. If
+    genome_class is None, the implementation with the smallest projected
+    footprint is used.
+
+    If a Profiler is given as profile, the operations on the genome are
+    profiled with it. Profiling doesn't change the result.
+
     >>> sim_te(30, 10, seed = 1984, theta = SimParams(te_len=10))
-    '---AAAA------------x--xAAAAxxx------AAAA-xxxxAAAA------'
+    '--AAAA-------AAAA--AAAAxxxx----x------xxxx--AAAA-------'
     """
+    if engine == "kernel":
+        if profile is not None:
+            raise ValueError("only the python engine can be profiled")
+        from kernel import estimate_nbytes, run_kernel
+        if memory_budget is not None:
+            length, _ = project_growth(n, k, theta)
+            check_budget("The kernel", estimate_nbytes(k) +
+                         ArrayGenome.estimate_str_nbytes(length),
+                         memory_budget)
+        return str(run_kernel(n, k, theta, seed))
+    if engine != "python":
+        raise ValueError(f"unknown simulation engine {engine!r}")
+
+    if genome_class is None or memory_budget is not None:
+        genome_class = choose_genome_class(n, k, theta,
+                                           genome_class, memory_budget)
+
     rand.seed(seed)
     np.random.seed(seed)
+    lengths = as_sampler(theta.te_len)
+    offsets = as_sampler(theta.te_offset)
+    lengths.reset()
+    offsets.reset()
+
+    if profile is not None:
+        genome_class = profile.profile_class(genome_class)
+        sampling = profile.sampling()
+    else:
+        sampling = contextlib.nullcontext()
 
     genome = genome_class(n)
-    for _ in range(k):
-        active = genome.active_tes()
-        theta_ins, theta_cpy, theta_dis = theta.weights
-        # weigh the operations with the number of active TEs
-        op_weights = (theta_ins,
-                      len(active) * theta_cpy,
-                      len(active) * theta_dis)
-        match Ops.sample(op_weights):
-            case Ops.INSERT:
-                pos = rand.randint(0, len(genome))
-                length = np.random.geometric(1/theta.te_len)
-                genome.insert_te(pos, length)
-
-            case Ops.COPY:
-                te = rand.choice(active)
-                offset = np.random.geometric(1/theta.te_offset)
-                if rand.random() < 0.5:
-                    offset = -offset
-                genome.copy_te(te, offset)
-
-            case Ops.DISABLE:
-                te = rand.choice(active)
-                genome.disable_te(te)
+    family = genome.lineage.family  # for family-dependent offsets
+    with sampling:
+        for _ in range(k):
+            active = genome.active_tes()
+            theta_ins, theta_cpy, theta_dis = theta.weights
+            # weigh the operations with the number of active TEs
+            op_weights = (theta_ins,
+                          len(active) * theta_cpy,
+                          len(active) * theta_dis)
+            match Ops.sample(op_weights):
+                case Ops.INSERT:
+                    pos = rand.randint(0, len(genome))
+                    # The new TE starts a family, named by its id
+                    length = lengths.draw(len(family))
+                    genome.insert_te(pos, length)
+
+                case Ops.COPY:
+                    te = rand.choice(active)
+                    offset = offsets.draw(family[te])
+                    if rand.random() < 0.5:
+                        offset = -offset
+                    genome.copy_te(te, offset)
+
+                case Ops.DISABLE:
+                    te = rand.choice(active)
+                    genome.disable_te(te)
 
     return str(genome)
 
 
-if __name__ == '__main__':
-    import timeit
-    start_time = timeit.default_timer()
-    sim_te(1_000_000, 1000)
-    elapsed = timeit.default_timer() - start_time
-    print("Python lists:", elapsed)
+def benchmark(n: int, k: int, **kwargs) -> dict[str, float]:
+    """
+    Time a simulation and measure its memory use.
 
+    The keyword arguments are passed on to sim_te. Returns the running
+    time in seconds, the peak memory allocated by Python in a second,
+    traced, run and the peak resident set size of the process in bytes.
+    Run it in a fresh process to get the peak RSS of a single
+    implementation.
+    """
     start_time = timeit.default_timer()
-    sim_te(1_000_000, 1000, genome_class=LinkedListGenome)
+    sim_te(n, k, **kwargs)
     elapsed = timeit.default_timer() - start_time
-    print("Linked lists:", elapsed)
+
+    tracemalloc.start()
+    sim_te(n, k, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # ru_maxrss is in bytes on macOS but in kilobytes on Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        rss *= 1024
+
+    return {'time': elapsed, 'traced_peak': peak, 'peak_rss': rss}
+
+
+if __name__ == '__main__':
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    runs = [
+        ("Python lists", {'genome_class': ListGenome}),
+        ("Linked lists", {'genome_class': LinkedListGenome}),
+        ("NumPy arrays", {'genome_class': ArrayGenome}),
+        ("Kernel", {'engine': "kernel"}),
+    ]
+    for label, kwargs in runs:
+        # A fresh process per implementation, so the peak RSS is its own
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context('spawn')
+        ) as pool:
+            stats = pool.submit(benchmark, 1_000_000, 1000, **kwargs).result()
+        print(f"{label}: {stats['time']:.3f}s, "
+              f"traced peak {stats['traced_peak'] / 2**20:.1f} MiB, "
+              f"peak RSS {stats['peak_rss'] / 2**20:.1f} MiB")
@@ -0,0 +1,231 @@
+"""
+Parameter sweeps over the simulator, with results cached on disk.
+
+A sweep is a list of Jobs, typically built with grid(). run_sweep()
+dispatches the jobs to a pool of worker processes from asyncio, and
+stores every result in a ResultCache keyed by the parameters, the seed
+and the ENGINE_VERSION of the simulator, so a configuration that has
+already been run, by anyone sharing the cache directory, is returned
+without simulating it again.
+"""
+
+from __future__ import annotations
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+from concurrent.futures import (
+    Executor, ProcessPoolExecutor, ThreadPoolExecutor
+)
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Type
+from genome import Genome, ArrayGenome
+from samplers import Geometric, Sampler, as_sampler
+from simulate import ENGINE_VERSION, SimParams, sim_te
+
+
+@dataclass(frozen=True)
+class Job:
+    """A single simulation in a sweep."""
+
+    n: int
+    k: int
+    theta: SimParams = field(default_factory=SimParams)
+    seed: int = 0
+    genome_class: Type[Genome] = ArrayGenome
+    engine: str = "python"
+
+    def key(self) -> str:
+        """
+        Get the cache key for the job.
+
+        Raises ValueError if a distribution in the parameters can't be
+        identified, since we can't tell if results for it are cached.
+        """
+        config = {
+            'n': self.n, 'k': self.k,
+            'te_len': distribution_key(self.theta.te_len),
+            'te_offset': distribution_key(self.theta.te_offset),
+            'weights': [float(w) for w in self.theta.weights],
+            'seed': self.seed,
+            'genome_class': self.genome_class.__name__,
+            'engine': self.engine,
+            'version': ENGINE_VERSION,
+        }
+        text = json.dumps(config, sort_keys=True)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+
+def distribution_key(dist: float | Sampler) -> str:
+    """
+    Get the cache key for a TE length or offset parameter.
+
+    Numbers are means of geometric distributions, so 200, 200.0 and
+    Geometric(200) all get the same key.
+
+    >>> distribution_key(200) == distribution_key(Geometric(200.0))
+    True
+    """
+    if not isinstance(dist, (int, float, Sampler)):
+        raise ValueError(f"can't make a cache key for {dist!r}")
+    return as_sampler(dist).cache_key()
+
+
+def run_job(job: Job) -> str:
+    """Run the simulation for a job."""
+    return sim_te(job.n, job.k, theta=job.theta, seed=job.seed,
+                  genome_class=job.genome_class, engine=job.engine)
+
+
+def grid(ns: Iterable[int], ks: Iterable[int],
+         thetas: Iterable[SimParams], seeds: Iterable[int],
+         **kwargs) -> list[Job]:
+    """
+    Get the jobs for all combinations of n, k, parameters and seed.
+
+    The keyword arguments (genome_class, engine) are used for all jobs.
+
+    >>> len(grid([100, 200], [10], [SimParams()], range(3)))
+    6
+    """
+    return [
+        Job(n, k, theta, seed, **kwargs)
+        for n, k, theta, seed in itertools.product(ns, ks, thetas, seeds)
+    ]
+
+
+class ResultCache:
+    """
+    Simulation results stored as files in a directory.
+
+    When the files take up more than max_bytes, the least recently used
+    are removed. Reading a result counts as using it.
+    """
+
+    def __init__(self, directory: str | os.PathLike,
+                 max_bytes: int | None = None):
+        """Use directory for the cache, creating it if necessary."""
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> Path:
+        """Get the file for a key."""
+        return self.directory / f"{key}.txt"
+
+    def get(self, key: str) -> str | None:
+        """Get a cached result, or None if it isn't there."""
+        path = self._path(key)
+        try:
+            result = path.read_text()
+            os.utime(path)  # mark it as recently used
+        except FileNotFoundError:
+            return None  # not there, or just evicted by someone else
+        return result
+
+    def put(self, key: str, result: str) -> None:
+        """Store a result and evict old ones if we are over the limit."""
+        # Write to a temporary file first, so other processes never
+        # see a half-written result
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, 'w') as f:
+            f.write(result)
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently used results until we fit."""
+        if self.max_bytes is None:
+            return
+        files = []
+        for path in self.directory.glob("*.txt"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # removed by someone else
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+async def run_sweep(jobs: list[Job], cache: ResultCache, *,
+                    executor: Executor | None = None,
+                    progress: Callable[[int, int], None] | None = None
+                    ) -> list[str]:
+    """
+    Run all the jobs, using cached results where we have them.
+
+    Returns the results in the same order as the jobs. Jobs that are
+    not in the cache run in executor, a process pool by default, and
+    identical jobs only run once. If progress is given, it is called
+    with the number of finished jobs and the total every time a job
+    finishes.
+
+    Cancelling the sweep cancels the jobs that haven't started yet;
+    results that were already done are still in the cache.
+
+    Simulations with the python engine seed the global random generators
+    and draw from the samplers in their parameters, so they can't share a
+    process; running them in a thread pool raises ValueError.
+    """
+    if isinstance(executor, ThreadPoolExecutor) and \
+            any(job.engine == "python" for job in jobs):
+        raise ValueError("python engine jobs can't run in threads")
+
+    loop = asyncio.get_running_loop()
+    results: list[str | None] = [None] * len(jobs)
+    done = 0
+
+    def report() -> None:
+        if progress is not None:
+            progress(done, len(jobs))
+
+    # Look up the cache, and group the rest of the jobs by key so
+    # identical jobs are only run once
+    todo: dict[str, list[int]] = {}
+    for i, job in enumerate(jobs):
+        cached = cache.get(job.key())
+        if cached is None:
+            todo.setdefault(job.key(), []).append(i)
+        else:
+            results[i] = cached
+            done += 1
+            report()
+
+    own_executor = executor is None and len(todo) > 0
+    if own_executor:
+        executor = ProcessPoolExecutor()
+    running = {
+        asyncio.ensure_future(
+            loop.run_in_executor(executor, run_job, jobs[indices[0]])
+        ): key
+        for key, indices in todo.items()
+    }
+    try:
+        pending = set(running)
+        while pending:
+            finished, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in finished:
+                key = running[future]
+                result = future.result()
+                cache.put(key, result)
+                for i in todo[key]:
+                    results[i] = result
+                    done += 1
+                    report()
+    finally:
+        for future in running:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return results  # type: ignore
@@ -0,0 +1,139 @@
+"""Testing genomes with several chromosomes."""
+
+import random
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pytest
+from genome import ArrayGenome, LinkedListGenome, LinkedListGenome2
+from chromosomes import MultiGenome, Shard, run_shard, sim_sharded
+from samplers import Empirical
+from simulate import SimParams
+from test_genome import run_genome_test, run_query_test, run_lineage_test
+
+
+def test_multi_genome() -> None:
+    """Test that a genome with one chromosome works like any other."""
+    run_genome_test(MultiGenome)
+    run_query_test(MultiGenome)
+    run_lineage_test(MultiGenome)
+
+
+def test_multi_genome_matches_array_genome() -> None:
+    """Test that random operations do the same as on a single genome."""
+    rng = random.Random(2022)
+    single = ArrayGenome(50)
+    multi = MultiGenome([10, 25, 15], LinkedListGenome)
+    for _ in range(300):
+        active = single.active_tes()
+        assert multi.active_tes() == active
+        x = rng.random()
+        if x < 0.3 or not active:
+            pos, length = rng.randint(0, len(single)), rng.randint(1, 5)
+            assert multi.insert_te(pos, length) == single.insert_te(pos, length)
+        elif x < 0.7:
+            te, offset = rng.choice(active), rng.randint(-100, 100)
+            assert multi.copy_te(te, offset) == single.copy_te(te, offset)
+        else:
+            te = rng.choice(active)
+            multi.disable_te(te)
+            single.disable_te(te)
+        assert str(multi) == str(single)
+
+    for te in single.active_tes():
+        assert multi.locate_te(te) == single.locate_te(te)
+    assert multi.lineage.parent == single.lineage.parent
+    assert multi.lineage.born == single.lineage.born
+
+
+def test_routing() -> None:
+    """Test that TEs end up in the right chromosome with the right ids."""
+    genome = MultiGenome([5, 5])
+    assert 1 == genome.insert_te(7, 2)
+    assert [str(c) for c in genome.chromosomes] == ["-----", "--AA---"]
+    assert genome.to_local(1) == (1, 1)
+
+    # Copy from the second chromosome into the first
+    assert 2 == genome.copy_te(1, -6)
+    assert [str(c) for c in genome.chromosomes] == ["-AA----", "--AA---"]
+    assert genome.to_local(2) == (0, 1)
+    assert genome.to_global(0, 1) == 2
+    assert genome.locate_te(1) == (9, 11)
+    assert genome.ancestry(2) == [2, 1]
+
+    ids, starts, ends, active = genome.te_segments()
+    assert ids.tolist() == [2, 1]
+    assert starts.tolist() == [1, 9]
+    assert ends.tolist() == [3, 11]
+
+
+def test_sharded_simulation_is_deterministic() -> None:
+    """Test that the result doesn't depend on how it is run."""
+    theta = SimParams(te_len=10, te_offset=50)
+    serial = sim_sharded([200, 300, 100], 500, theta=theta, seed=1984)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        parallel = sim_sharded([200, 300, 100], 500, theta=theta,
+                               seed=1984, executor=pool)
+    assert str(serial) == str(parallel)
+    assert serial.active_tes() == parallel.active_tes()
+    assert serial.lineage.parent == parallel.lineage.parent
+    assert serial.lineage.ops == 500
+    assert str(serial) != str(
+        sim_sharded([200, 300, 100], 500, theta=theta, seed=1985)
+    )
+
+    # The global ids and the chromosomes agree
+    for te in serial.active_tes():
+        c, local = serial.to_local(te)
+        start, end = serial.locate_te(te)
+        assert serial.chromosomes[c].locate_te(local) == (
+            start - serial.offsets()[c], end - serial.offsets()[c]
+        )
+
+
+def test_copy_to_end_of_chromosome_escapes() -> None:
+    """Test that a copy to just past the chromosome's end leaves it."""
+    genome = ArrayGenome(10)
+    genome.insert_te(2, 3)
+    theta = SimParams(te_offset=Empirical([11], [1]), weights=(0, 1, 0))
+    shard = Shard(genome, 1, theta, 0.0, np.random.SeedSequence(1), [0, 1])
+    genome, escapes = run_shard(shard)
+    assert str(genome) == "--AAA--------"
+    assert len(escapes) == 1
+    # The copy would start at 2 + 11, right at the end of the chromosome
+    assert escapes[0][1:] == (1, 3, 0)
+
+    # Done at the end of the epoch, the copy starts the next chromosome
+    multi = MultiGenome([10, 5])
+    multi.insert_te(2, 3)
+    multi.copy_te(1, 11)
+    assert [str(c) for c in multi.chromosomes] == \
+        ["--AAA--------", "AAA-----"]
+
+
+@pytest.mark.parametrize("genome_class", [LinkedListGenome, LinkedListGenome2])
+def test_sharded_linked_lists(genome_class) -> None:
+    """Test that linked list chromosomes can be sent to worker processes."""
+    theta = SimParams(te_len=200)
+    serial = sim_sharded([5000, 5000], 200, theta=theta, seed=3,
+                         genome_class=genome_class)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        parallel = sim_sharded([5000, 5000], 200, theta=theta, seed=3,
+                               genome_class=genome_class, executor=pool)
+    assert str(serial) == str(parallel)
+    assert serial.active_tes() == parallel.active_tes()
+
+
+def test_escaped_copies_stay_out_of_their_chromosome() -> None:
+    """Test that later inserts don't move escaped copies back inside."""
+    theta = SimParams(te_len=Empirical([1], [1]),
+                      te_offset=Empirical([150], [1]),
+                      weights=(1.0, 1.0, 0.0))
+    genome = sim_sharded([100, 100, 100], 100, theta=theta, seed=4,
+                         epochs=1)
+    # Every copy jumps out of a chromosome of 100 and few inserts, and
+    # lands less than 150 from its ends, so no chromosome holds a TE and a
+    # copy of it
+    for te in range(1, genome.id + 1):
+        parent = genome.lineage.parent[te]
+        if parent:
+            assert genome.to_local(te)[0] != genome.to_local(parent)[0]
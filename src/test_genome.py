@@ -9,7 +9,8 @@ from genome import (
     Genome,
     ListGenome,
     LinkedListGenome, 
-    LinkedListGenome2
+    LinkedListGenome2,
+    ArrayGenome
 )
 from typing import Type
 
@@ -51,6 +52,13 @@ def run_genome_test(genome_class: Type[Genome]) -> None:
         "xxxxxxxxxx-----xxxxxAAAAAAAAAAxxxxx-----"
     assert genome.active_tes() == [2, 5]
 
+    # Disabling a TE that is already disabled does nothing
+    genome.disable_te(3)
+    assert str(genome) == \
+        "-----xxxxxAAAAAAAAAAxxxxx-----" \
+        "xxxxxxxxxx-----xxxxxAAAAAAAAAAxxxxx-----"
+    assert genome.active_tes() == [2, 5]
+
 
 def test_list_genome() -> None:
     """Test that the Python list implementation works."""
@@ -63,4 +71,106 @@ def test_linked_list_genome() -> None:
 
 def test_linked_list_genome2() -> None:
     """Test that the linked list implementation works."""
-    run_genome_test(LinkedListGenome2)
\ No newline at end of file
+    run_genome_test(LinkedListGenome2)
+
+
+def test_array_genome() -> None:
+    """Test that the NumPy array implementation works."""
+    run_genome_test(ArrayGenome)
+
+def run_query_test(genome_class: Type[Genome]) -> None:
+    """Test the region queries of a Genome implementation."""
+    genome = genome_class(20)
+    assert genome.slice(0, 5) == "-----"
+    assert genome.annotation_at(0) == "-"
+
+    assert 1 == genome.insert_te(5, 10)
+    assert genome.locate_te(1) == (5, 15)
+    assert genome.slice(3, 17) == "--AAAAAAAAAA--"
+    assert genome.annotation_at(14) == "A"
+    assert genome.annotation_at(15) == "-"
+
+    assert 2 == genome.insert_te(10, 10)
+    assert genome.locate_te(1) is None
+    assert genome.locate_te(2) == (10, 20)
+    assert genome.slice(-3, 12) == "--------xxxxxAA"
+    assert genome.annotation_at(45) == "x"
+    assert genome.annotation_at(-1) == "-"
+
+    # Copy 2 around the start of the genome and look at it there
+    assert 3 == genome.copy_te(2, -15)
+    assert genome.locate_te(3) == (35, 45)
+    assert genome.locate_te(2) == (10, 20)
+    assert genome.slice(33, 47) == "--AAAAAAAAAA--"
+    assert genome.slice(40, 57) == "AAAAA----------xx"
+    assert genome.slice(7, 7) == ""
+    assert genome.slice(0, len(genome)) == str(genome)
+
+
+def test_list_genome_queries() -> None:
+    """Test the region queries of the Python list implementation."""
+    run_query_test(ListGenome)
+
+
+def test_linked_list_genome_queries() -> None:
+    """Test the region queries of the linked list implementation."""
+    run_query_test(LinkedListGenome)
+
+
+def test_linked_list_genome2_queries() -> None:
+    """Test the region queries of the second linked list implementation."""
+    run_query_test(LinkedListGenome2)
+
+
+def test_array_genome_queries() -> None:
+    """Test the region queries of the NumPy array implementation."""
+    run_query_test(ArrayGenome)
+
+
+def test_nbytes() -> None:
+    """Test that the footprints grow with the genome and match estimates."""
+    for genome_class in (ListGenome, LinkedListGenome,
+                         LinkedListGenome2, ArrayGenome):
+        genome = genome_class(1000)
+        before = genome.nbytes()
+        genome.insert_te(10, 500)
+        assert genome.nbytes() > before
+        estimate = genome_class.estimate_nbytes(1000, len(genome), 1)
+        assert estimate / 2 <= genome.nbytes() <= estimate * 2
+
+
+def run_lineage_test(genome_class: Type[Genome]) -> None:
+    """Test that a Genome implementation records where TEs came from."""
+    genome = genome_class(100)
+    assert 1 == genome.insert_te(10, 5)
+    assert 2 == genome.copy_te(1, 20)
+    genome.disable_te(1)
+    assert 3 == genome.copy_te(2, 20)
+    assert 4 == genome.insert_te(90, 5)
+
+    assert genome.ancestry(3) == [3, 2, 1]
+    assert genome.ancestry(4) == [4]
+    assert genome.family_sizes() == {1: 3, 4: 1}
+    assert genome.family_sizes(active_only=True) == {1: 2, 4: 1}
+    assert list(genome.lineage.born) == [0, 0, 1, 3, 4]
+    assert genome.lineage.ops == 5
+
+
+def test_list_genome_lineage() -> None:
+    """Test the lineage of the Python list implementation."""
+    run_lineage_test(ListGenome)
+
+
+def test_linked_list_genome_lineage() -> None:
+    """Test the lineage of the linked list implementation."""
+    run_lineage_test(LinkedListGenome)
+
+
+def test_linked_list_genome2_lineage() -> None:
+    """Test the lineage of the second linked list implementation."""
+    run_lineage_test(LinkedListGenome2)
+
+
+def test_array_genome_lineage() -> None:
+    """Test the lineage of the NumPy array implementation."""
+    run_lineage_test(ArrayGenome)
@@ -0,0 +1,67 @@
+"""Testing binary genome files."""
+
+import random
+import pytest
+from genome import (
+    ListGenome,
+    LinkedListGenome,
+    LinkedListGenome2,
+    ArrayGenome
+)
+from genome_io import dump, from_buffer, load, to_bytes
+
+GENOME_CLASSES = [ListGenome, LinkedListGenome, LinkedListGenome2, ArrayGenome]
+
+
+def random_genome(genome_class, seed: int):
+    """Build a genome with some active and disabled TEs."""
+    rng = random.Random(seed)
+    genome = genome_class(200)
+    for _ in range(30):
+        active = genome.active_tes()
+        if not active or rng.random() < 0.4:
+            genome.insert_te(rng.randint(2, len(genome) - 1),
+                             rng.randint(1, 10))
+        elif rng.random() < 0.5:
+            genome.copy_te(rng.choice(active), rng.randint(-100, 100))
+        else:
+            genome.disable_te(rng.choice(active))
+    return genome
+
+
+@pytest.mark.parametrize("source", GENOME_CLASSES)
+@pytest.mark.parametrize("target", GENOME_CLASSES)
+def test_round_trip(source, target) -> None:
+    """Test that any genome can be loaded as any other kind."""
+    genome = random_genome(source, 2022)
+    loaded = from_buffer(to_bytes(genome), target)
+    assert str(loaded) == str(genome)
+    assert len(loaded.active_tes()) == len(genome.active_tes())
+
+
+def test_array_genome_keeps_ids(tmp_path) -> None:
+    """Test that an ArrayGenome file keeps the TE ids."""
+    genome = random_genome(ArrayGenome, 1984)
+    dump(genome, tmp_path / "genome.teg")
+    loaded = load(tmp_path / "genome.teg")
+    assert loaded.active_tes() == genome.active_tes()
+    for te in genome.active_tes():
+        assert loaded.locate_te(te) == genome.locate_te(te)
+
+    # The loaded genome can be changed without touching the file
+    loaded.insert_te(0, 10)
+    loaded.disable_te(loaded.active_tes()[0])
+    assert str(load(tmp_path / "genome.teg")) == str(genome)
+
+
+def test_files_are_small() -> None:
+    """Test that long stretches don't take up space."""
+    genome = ArrayGenome(10**6)
+    genome.insert_te(500, 1000)
+    assert len(to_bytes(genome)) < 100
+
+
+def test_not_a_genome() -> None:
+    """Test that we reject other data."""
+    with pytest.raises(ValueError):
+        from_buffer(b"-" * 100)
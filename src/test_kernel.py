@@ -0,0 +1,89 @@
+"""Testing the compiled simulation kernel."""
+
+import tracemalloc
+import numpy as np
+import pytest
+from genome import ArrayGenome
+from kernel import draw, estimate_nbytes, run_kernel, simulate_kernel
+from simulate import SimParams, sim_te
+
+
+def test_kernel_is_deterministic() -> None:
+    """Test that the same seed gives the same genome."""
+    theta = SimParams(te_len=10, te_offset=20)
+    first = sim_te(100, 200, theta=theta, seed=2022, engine="kernel")
+    second = sim_te(100, 200, theta=theta, seed=2022, engine="kernel")
+    assert first == second
+
+
+def test_kernel_matches_array_genome() -> None:
+    """Test that the kernel does what ArrayGenome does on the same draws."""
+    theta = SimParams(te_len=10, te_offset=20)
+    k = 300
+    op_u, pos_u, te_u, lengths, offsets = draw(k, theta, 1984)
+
+    genome = ArrayGenome(100)
+    w_ins, w_cpy, w_dis = theta.weights
+    for t in range(k):
+        active = genome.active_tes()
+        x = op_u[t] * (w_ins + len(active) * w_cpy + len(active) * w_dis)
+        if x < w_ins:
+            genome.insert_te(int(pos_u[t] * (len(genome) + 1)), lengths[t])
+        elif x < w_ins + len(active) * w_cpy:
+            genome.copy_te(active[int(te_u[t] * len(active))], offsets[t])
+        else:
+            genome.disable_te(active[int(te_u[t] * len(active))])
+
+    result = run_kernel(100, k, theta, 1984)
+    assert str(result) == str(genome)
+    assert result.lineage.parent == genome.lineage.parent
+    assert result.lineage.family == genome.lineage.family
+    assert result.lineage.born == genome.lineage.born
+
+
+def test_compiled_kernel_matches_python() -> None:
+    """Test that the compiled kernel gives the same as the Python one."""
+    pytest.importorskip("numba")
+    theta = SimParams(te_len=10, te_offset=20)
+    args = (100, np.array(theta.weights), *draw(300, theta, 7))
+    compiled = simulate_kernel(*args)
+    python = simulate_kernel.py_func(*args)
+    for x, y in zip(compiled, python):
+        assert np.array_equal(x, y)
+
+
+def test_kernel_memory_estimate(monkeypatch) -> None:
+    """Test that the kernel's footprint grows with k, not with the TEs."""
+    # Without TEs to copy, the arrays are still sized for k operations
+    theta = SimParams(weights=(1.0, 0.0, 0.0), te_len=1)
+    with pytest.raises(MemoryError):
+        sim_te(100, 10**6, theta=theta, engine="kernel",
+               memory_budget=10**7)
+
+    # Run the Python version, whose arrays tracemalloc can see
+    import kernel
+    monkeypatch.setattr(kernel, "simulate_kernel",
+                        getattr(simulate_kernel, "py_func", simulate_kernel))
+    k = 500
+    theta = SimParams(te_len=10, te_offset=20)
+    run_kernel(100, 10, theta, 1)  # so imports aren't counted
+    tracemalloc.start()
+    try:
+        run_kernel(100, k, theta, 1)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak <= estimate_nbytes(k)
+
+
+def test_kernel_needs_positive_weights() -> None:
+    """Test that the kernel refuses to pick from no operations."""
+    theta = SimParams(weights=(0.0, 1.0, 1.0))
+    with pytest.raises(ValueError):
+        sim_te(20, 5, theta=theta, seed=1)
+    with pytest.raises(ValueError):
+        sim_te(20, 5, theta=theta, seed=1, engine="kernel")
+    # Also without numba
+    python = getattr(simulate_kernel, "py_func", simulate_kernel)
+    with pytest.raises(ValueError):
+        python(20, np.array(theta.weights), *draw(5, theta, 1))
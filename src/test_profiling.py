@@ -0,0 +1,66 @@
+"""Testing the profiling of genome operations."""
+
+import json
+import pytest
+from genome import LinkedListGenome, ArrayGenome
+from profiling import Profiler
+from simulate import SimParams, sim_te
+
+
+def test_profiling_keeps_results() -> None:
+    """Test that a profiled simulation gives the same genome."""
+    theta = SimParams(te_len=10)
+    profiler = Profiler()
+    assert sim_te(30, 50, seed=1984, theta=theta, profile=profiler) == \
+        sim_te(30, 50, seed=1984, theta=theta)
+    assert profiler.calls["ListGenome.active_tes"] == 50
+
+
+def test_profiled_stacks() -> None:
+    """Test that nested operations show up as stacks."""
+    profiler = Profiler(trace=True)
+    genome = profiler.profile_class(LinkedListGenome)(100)
+    assert isinstance(genome, LinkedListGenome)
+    genome.insert_te(10, 5)
+    genome.copy_te(1, 20)
+    len(genome)
+
+    assert profiler.calls["LinkedListGenome.insert_te"] == 2
+    assert profiler.calls["LinkedListGenome.copy_te"] == 1
+    assert profiler.calls["LinkedListGenome.__len__"] == 1
+    stacks = {line.rsplit(" ", 1)[0] for line in profiler.collapsed()}
+    assert "LinkedListGenome.copy_te;LinkedListGenome.insert_te" in stacks
+    assert "LinkedListGenome.insert_te" in stacks
+    assert set(profiler.self_times()) == set(profiler.calls)
+    assert genome.lineage.ops == 2  # profiling doesn't add operations
+
+    events = json.loads(json.dumps(profiler.chrome_trace()))["traceEvents"]
+    assert len(events) == sum(profiler.calls.values())
+    # The copy's insert happens within the copy
+    insert, copy = [e for e in events if e["name"] in (
+        "LinkedListGenome.insert_te", "LinkedListGenome.copy_te"
+    )][1:]
+    assert copy["ts"] <= insert["ts"]
+    assert insert["ts"] + insert["dur"] <= copy["ts"] + copy["dur"]
+
+
+def test_sampling() -> None:
+    """Test that the sampler finds the lines in the operations."""
+    profiler = Profiler(sample_interval=0.0001)
+    sim_te(10_000, 500, seed=2022, genome_class=LinkedListGenome,
+           profile=profiler)
+    assert profiler.samples
+    for stack in profiler.samples:
+        assert stack[0].startswith(("insert_te", "copy_te", "disable_te",
+                                    "active_tes", "__len__"))
+    assert any(line.startswith("copy_te (genome.py:")
+               for line in profiler.collapsed(samples=True))
+
+
+def test_profiling_needs_python_engine() -> None:
+    """Test that we can't profile what doesn't use the Genome classes."""
+    with pytest.raises(ValueError):
+        sim_te(30, 10, engine="kernel", profile=Profiler())
+    with pytest.raises(ValueError):
+        Profiler().chrome_trace()
+    assert Profiler().profile_class(ArrayGenome).__name__ == "ArrayGenome"
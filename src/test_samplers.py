@@ -0,0 +1,101 @@
+"""Testing TE length and offset distributions."""
+
+import tracemalloc
+import numpy as np
+import pytest
+from chromosomes import sim_sharded
+from genome import ArrayGenome
+from samplers import (
+    FAMILY_BUFFER_SIZE, ByFamily, Empirical, Geometric, LogNormal
+)
+from simulate import SimParams, sim_te
+
+
+def test_buffered_draws_match_bulk_draws() -> None:
+    """Test that drawing one at a time gives the numbers from fill."""
+    sampler = Geometric(20, buffer_size=16)
+    sampler.reset(np.random.default_rng(1))
+    drawn = [sampler.draw() for _ in range(40)]  # refills twice
+
+    rng = np.random.default_rng(1)
+    bulk = np.concatenate([sampler.fill(16, rng) for _ in range(3)])
+    assert drawn == bulk[:40].tolist()
+
+
+def test_distributions() -> None:
+    """Test that the samplers draw positive numbers around their mean."""
+    rng = np.random.default_rng(2022)
+    for sampler in (Geometric(50), LogNormal(50, 0.5),
+                    Empirical([10, 50, 90], [1, 2, 1])):
+        x = sampler.fill(100_000, rng)
+        assert x.min() >= 1
+        assert abs(x.mean() - sampler.mean()) < 1
+    assert set(Empirical([10, 50], [1, 1]).fill(100, rng)) == {10, 50}
+
+
+def test_by_family() -> None:
+    """Test that family samplers are picked by family."""
+    sampler = ByFamily({1: Empirical([7], [1])}, Empirical([3], [1]))
+    assert sampler.draw(1) == 7
+    assert sampler.draw(2) == 3
+    assert sampler.draw() == 3
+
+    sampler = ByFamily(lambda family: Empirical([family * 10], [1]),
+                       Empirical([3], [1]))
+    assert sampler.draw(4) == 40
+    assert sampler.draw(5) == 50
+    assert sampler.draw() == 3
+
+
+def test_sim_te_with_samplers() -> None:
+    """Test that simulations with other distributions are reproducible."""
+    theta = SimParams(
+        te_len=Empirical([5, 10, 20], [1, 1, 1]),
+        te_offset=ByFamily(lambda family: LogNormal(10 * family, 0.3),
+                           Geometric(50)),
+    )
+    first = sim_te(100, 100, theta=theta, seed=1, genome_class=ArrayGenome)
+    second = sim_te(100, 100, theta=theta, seed=1, genome_class=ArrayGenome)
+    assert first == second
+    assert first != sim_te(100, 100, theta=theta, seed=2,
+                           genome_class=ArrayGenome)
+
+
+def test_lengths_by_family() -> None:
+    """Test that inserted TEs get the length for their own family."""
+    theta = SimParams(
+        te_len=ByFamily({1: Empirical([7], [1])}, Empirical([3], [1])),
+        weights=(1.0, 0.0, 0.0),
+    )
+    genome = sim_te(100, 2, theta=theta, seed=1, genome_class=ArrayGenome)
+    assert len(genome) == 110
+
+    with pytest.raises(ValueError):
+        sim_te(100, 2, theta=theta, seed=1, engine="kernel")
+    offsets = SimParams(te_offset=ByFamily({}, Geometric(50)))
+    with pytest.raises(ValueError):
+        sim_te(100, 2, theta=offsets, seed=1, engine="kernel")
+    with pytest.raises(ValueError):
+        sim_sharded([50, 50], 2, theta=theta, seed=1)
+
+
+def test_many_families_are_cheap() -> None:
+    """Test that families that draw a few numbers only buffer a few."""
+    sampler = ByFamily(lambda family: Geometric(family), Geometric(10))
+    sampler.reset(np.random.default_rng(1))
+    tracemalloc.start()
+    try:
+        for family in range(1, 2001):
+            sampler.draw(family)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # A full buffer of 4096 numbers per family would be 64 MiB
+    assert peak < 2 * 2**20
+    assert all(len(s.buffer) == FAMILY_BUFFER_SIZE
+               for s in sampler.created.values())
+
+    # Families that are used a lot still get full buffers
+    for _ in range(10_000):
+        sampler.draw(1)
+    assert len(sampler.created[1].buffer) == sampler.created[1].buffer_size
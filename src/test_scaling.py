@@ -0,0 +1,116 @@
+"""
+Testing how the genome operations scale with the genome size.
+
+These tests time the operations on genomes of doubling size and check
+that the time per operation stays within a bound, so they catch an
+operation that accidentally becomes linear in n. They are slow, so they
+only run with
+
+    python3 -m pytest src --scaling
+"""
+
+import gc
+import timeit
+from typing import Callable, Type
+import numpy as np
+import pytest
+from genome import (
+    Genome,
+    ListGenome,
+    LinkedListGenome,
+    LinkedListGenome2,
+    ArrayGenome
+)
+
+pytestmark = pytest.mark.scaling
+
+SIZES = [10**5 * 2**i for i in range(7)]
+
+# How much slower an operation may get when n doubles
+BOUND = 1.3
+
+# How many times each size is timed
+REPEATS = 7
+
+ALL = [ListGenome, LinkedListGenome, LinkedListGenome2, ArrayGenome]
+
+# Implementations where inserting, copying and disabling don't depend
+# on the amount of free space in the genome
+INDEXED = [LinkedListGenome, LinkedListGenome2, ArrayGenome]
+
+
+def populated(genome_class: Type[Genome], n: int) -> Genome:
+    """Create a genome of size n with TEs spread over it."""
+    genome = genome_class(n)
+    for i in range(20):
+        genome.insert_te(i * len(genome) // 20, 50)
+    return genome
+
+
+def op_times(setup: Callable[[int], object],
+             op: Callable[[object], None]) -> list[float]:
+    """
+    Get the time for running op on setup(n) for each n in SIZES.
+
+    Each op runs on a fresh object from setup, since the operations may
+    change it. The sizes are timed in turns, several times over, and the
+    best time for each is kept, so a busy moment on the machine doesn't
+    make one size look slower than the others.
+    """
+    times = [float("inf")] * len(SIZES)
+    for _ in range(REPEATS):
+        for i, n in enumerate(SIZES):
+            obj = setup(n)
+            gc.disable()
+            try:
+                start = timeit.default_timer()
+                op(obj)
+                times[i] = min(times[i], timeit.default_timer() - start)
+            finally:
+                gc.enable()
+    return times
+
+
+def assert_scales(times: list[float]) -> None:
+    """
+    Check that doubling n increases the time less than BOUND.
+
+    The factor is taken from the slope of a line through the times on a
+    log-log scale, which is less sensitive to noise than the ratio of any
+    two of them.
+    """
+    slope, _ = np.polyfit(np.log2(SIZES), np.log2(times), 1)
+    assert 2**slope < BOUND, times
+
+
+@pytest.mark.parametrize("genome_class", ALL)
+def test_init_scales(genome_class: Type[Genome]) -> None:
+    """Test that creating a genome doesn't depend on n."""
+    def create(n: int) -> None:
+        for _ in range(5000):
+            genome_class(n)
+    assert_scales(op_times(lambda n: n, create))
+
+
+@pytest.mark.parametrize("genome_class", ALL)
+def test_len_scales(genome_class: Type[Genome]) -> None:
+    """Test that len() doesn't depend on n."""
+    def lengths(genome: Genome) -> None:
+        for _ in range(50_000):
+            len(genome)
+    assert_scales(op_times(lambda n: populated(genome_class, n), lengths))
+
+
+@pytest.mark.parametrize("genome_class", INDEXED)
+def test_operations_scale(genome_class: Type[Genome]) -> None:
+    """Test that insert_te, copy_te and disable_te don't depend on n."""
+    def operations(genome: Genome) -> None:
+        for i in range(100):
+            genome.insert_te((2 * i + 1) * len(genome) // 200, 50)
+        for te in genome.active_tes()[:50]:
+            genome.copy_te(te, len(genome) // 7)
+        for te in genome.active_tes()[:50]:
+            genome.disable_te(te)
+    assert_scales(
+        op_times(lambda n: populated(genome_class, n), operations)
+    )
@@ -0,0 +1,38 @@
+"""Testing the simulator."""
+
+import tracemalloc
+import pytest
+from genome import ArrayGenome, ListGenome
+from simulate import SimParams, choose_genome_class, sim_te
+
+
+def test_memory_budget_refuses() -> None:
+    """Test that sim_te refuses an implementation over the budget."""
+    with pytest.raises(MemoryError):
+        sim_te(10**7, 10, genome_class=ListGenome, memory_budget=10**7)
+    with pytest.raises(MemoryError):
+        sim_te(10**7, 1000, engine="kernel", memory_budget=10)
+    # Few TEs, but the returned string is still 10**7 characters
+    with pytest.raises(MemoryError):
+        sim_te(10**7, 10, genome_class=None, memory_budget=10**5)
+
+
+def test_memory_budget_covers_peak() -> None:
+    """Test that a simulation within its budget stays within it."""
+    theta = SimParams(te_len=100)
+    budget = 6 * 10**6
+    tracemalloc.start()
+    try:
+        sim_te(10**6, 100, theta=theta, seed=1, genome_class=None,
+               memory_budget=budget)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak <= budget
+
+
+def test_memory_budget_picks() -> None:
+    """Test that we pick the smallest implementation without a class."""
+    assert choose_genome_class(10**7, 100, SimParams()) is ArrayGenome
+    genome = sim_te(1000, 10, genome_class=None, memory_budget=10**6)
+    assert len(genome) >= 1000
@@ -0,0 +1,134 @@
+"""Testing parameter sweeps."""
+
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+import pytest
+from samplers import ByFamily, Geometric
+from simulate import SimParams, sim_te
+from sweep import Job, ResultCache, grid, run_sweep
+
+
+class NoExecutor(Executor):
+    """An executor that fails if anything is submitted to it."""
+
+    def submit(self, fn, *args, **kwargs):
+        """Fail, since everything should have come from the cache."""
+        raise AssertionError("job was not taken from the cache")
+
+
+def test_sweep_caches_results(tmp_path) -> None:
+    """Test that a repeated sweep is answered from the cache."""
+    jobs = grid([50, 100], [20], [SimParams(te_len=5)], range(2))
+    jobs.append(jobs[0])  # a duplicate only runs once
+    cache = ResultCache(tmp_path)
+
+    seen = []
+    results = asyncio.run(run_sweep(
+        jobs, cache, progress=lambda done, total: seen.append((done, total))
+    ))
+    assert results == [
+        sim_te(job.n, job.k, theta=job.theta, seed=job.seed,
+               genome_class=job.genome_class)
+        for job in jobs
+    ]
+    assert seen[-1] == (5, 5)
+
+    again = asyncio.run(run_sweep(jobs, cache, executor=NoExecutor()))
+    assert again == results
+
+
+def test_cache_key_depends_on_everything() -> None:
+    """Test that changing any parameter changes the key."""
+    job = Job(100, 10, SimParams(), 1)
+    other = [
+        Job(101, 10, SimParams(), 1),
+        Job(100, 11, SimParams(), 1),
+        Job(100, 10, SimParams(te_len=201), 1),
+        Job(100, 10, SimParams(weights=(0.2, 2.0, 1.0)), 1),
+        Job(100, 10, SimParams(), 2),
+        Job(100, 10, SimParams(), 1, engine="kernel"),
+    ]
+    assert job.key() == Job(100, 10, SimParams(), 1).key()
+    assert len({job.key()} | {o.key() for o in other}) == len(other) + 1
+
+
+def test_cache_key_is_stable() -> None:
+    """Test that keys don't depend on how the same parameters are given."""
+    job = Job(100, 10, SimParams(te_len=200, te_offset=500), 1)
+    same = [
+        Job(100, 10, SimParams(te_len=200.0, te_offset=500), 1),
+        Job(100, 10, SimParams(te_len=Geometric(200), te_offset=500.0), 1),
+        Job(100, 10, SimParams(weights=(0.1, 2, 1)), 1),
+    ]
+    assert all(o.key() == job.key() for o in same)
+
+    by_family = SimParams(te_offset=ByFamily({1: Geometric(10)},
+                                             Geometric(500)))
+    assert Job(100, 10, by_family, 1).key() == Job(100, 10, SimParams(
+        te_offset=ByFamily({1: Geometric(10.0)}, Geometric(500))
+    ), 1).key()
+
+    # The buffer size changes what is drawn from the shared generator
+    assert Job(100, 10, SimParams(te_len=Geometric(20)), 1).key() != \
+        Job(100, 10, SimParams(te_len=Geometric(20, buffer_size=8)), 1).key()
+
+    # Samplers from a function can't be told apart, so they have no key
+    by_function = SimParams(te_offset=ByFamily(lambda family: Geometric(10),
+                                               Geometric(500)))
+    with pytest.raises(ValueError):
+        Job(100, 10, by_function, 1).key()
+
+
+def test_cache_evicts_least_recently_used(tmp_path) -> None:
+    """Test that the cache stays within its size."""
+    cache = ResultCache(tmp_path, max_bytes=25)
+    cache.put("a", "-" * 10)
+    time.sleep(0.01)
+    cache.put("b", "-" * 10)
+    time.sleep(0.01)
+    assert cache.get("a") is not None  # now b is the oldest
+    time.sleep(0.01)
+    cache.put("c", "-" * 10)
+    assert cache.get("b") is None
+    assert cache.get("a") == "-" * 10
+    assert cache.get("c") == "-" * 10
+
+
+def test_sweep_can_be_cancelled(tmp_path) -> None:
+    """Test that cancelling a sweep stops it."""
+    jobs = [Job(1000, 2000, seed=seed, engine="kernel") for seed in range(20)]
+
+    async def cancel_soon() -> None:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            task = asyncio.create_task(
+                run_sweep(jobs, ResultCache(tmp_path), executor=executor)
+            )
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(cancel_soon())
+    assert len(list(tmp_path.glob("*.txt"))) < len(jobs)
+
+
+def test_cache_survives_eviction_while_reading(tmp_path, monkeypatch) -> None:
+    """Test that a result evicted between reading and touching is a miss."""
+    cache = ResultCache(tmp_path)
+    cache.put("key", "result")
+
+    def evicted(path, *args) -> None:
+        path.unlink()
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(os, "utime", evicted)
+    assert cache.get("key") is None
+
+
+def test_python_jobs_refuse_threads(tmp_path) -> None:
+    """Test that python engine jobs can't share a process."""
+    with ThreadPoolExecutor() as executor:
+        with pytest.raises(ValueError):
+            asyncio.run(run_sweep([Job(100, 10)], ResultCache(tmp_path),
+                                  executor=executor))